@@ -2,8 +2,8 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, make_response, current_app, jsonify
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta, timezone
-import os, uuid, shutil, glob, json, math, secrets, csv, zipfile, base64 as _b64
-from io import BytesIO, StringIO
+import os, uuid, shutil, glob, json, math, secrets, csv, zipfile, tempfile, base64 as _b64
+from io import BytesIO, StringIO, TextIOWrapper
 from PIL import Image
 
 try:
@@ -34,10 +34,25 @@ def capture_exception(e):
     if _SENTRY_DSN:
         sentry_sdk.capture_exception(e)
 
-from neon_client import execute_query, execute_single, execute_batch_insert
+from neon_client import (
+    execute_query, execute_single, execute_batch_insert, execute_reads, prepare_stats, transaction, stream_query,
+    pool_stats, start_keepwarm, any_uuid, uuid_array,
+)
+import db_stats
+import pagination
+import queries
+from migrate import check_schema
 from planner import optimize_cuts
-from visualizer import draw_sheets_to_files
+from visualizer import (
+    sheet_records, draw_layout, derive_variant, variant_name, layout_hash,
+    SHEET_FORMATS, SHEET_VARIANTS,
+)
 from client_package import build_client_package_pdf, STANDARD_RULES
+from cut_pack import build_cut_pack_pdf
+from query_cache import (
+    cached_query, cached_single, cached_reads, execute_write, invalidate, job_tag, user_tag,
+    stats as query_cache_stats,
+)
 from collections import defaultdict
 from dotenv import load_dotenv
 from local_storage_manager import LocalStorageManager
@@ -50,6 +65,7 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
 csrf = CSRFProtect(app)
+db_stats.init_app(app)
 
 @app.context_processor
 def inject_now():
@@ -59,141 +75,9 @@ def inject_now():
 os.makedirs("static/sheets", exist_ok=True)
 os.makedirs("static/uploads", exist_ok=True)
 
-# Ensure cut_sheets table exists (safe to run on every startup)
-try:
-    execute_query("""
-        CREATE TABLE IF NOT EXISTS cut_sheets (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-            src VARCHAR(500) NOT NULL,
-            label VARCHAR(100),
-            sheet_number INTEGER,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        )
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not ensure cut_sheets table:", _e)
-
-try:
-    execute_query("""
-        ALTER TABLE estimates ADD COLUMN IF NOT EXISTS share_token VARCHAR(64) UNIQUE
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not add share_token to estimates:", _e)
-
-try:
-    execute_query("""
-        CREATE TABLE IF NOT EXISTS job_templates (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            name VARCHAR(255) NOT NULL,
-            description TEXT,
-            parts JSONB DEFAULT '[]',
-            accessories JSONB DEFAULT '[]',
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        )
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not ensure job_templates table:", _e)
-
-try:
-    execute_query("""
-        CREATE TABLE IF NOT EXISTS job_accessories (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-            name VARCHAR(255) NOT NULL,
-            quantity DECIMAL(10,2) DEFAULT 1,
-            unit VARCHAR(50) DEFAULT 'pieces',
-            unit_price DECIMAL(10,2) DEFAULT 0,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        )
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not ensure job_accessories table:", _e)
-
-try:
-    execute_query(
-        "ALTER TABLE job_templates ADD COLUMN IF NOT EXISTS source_job_id UUID REFERENCES jobs(id) ON DELETE SET NULL",
-        fetch=False
-    )
-except Exception as _e:
-    print("Warning: could not add source_job_id column:", _e)
-
-for _col, _def in [
-    ("phone",   "VARCHAR(50)"),
-    ("email",   "VARCHAR(255)"),
-    ("address", "TEXT"),
-    ("notes",   "TEXT"),
-]:
-    try:
-        execute_query(f"ALTER TABLE jobs ADD COLUMN IF NOT EXISTS {_col} {_def}", fetch=False)
-    except Exception as _e:
-        print(f"Warning: could not add {_col} to jobs:", _e)
-
-for _col, _def in [
-    ("reset_token_hash", "VARCHAR(64)"),
-    ("reset_token_expires", "TIMESTAMP WITH TIME ZONE"),
-]:
-    try:
-        execute_query(f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {_col} {_def}", fetch=False)
-    except Exception as _e:
-        print(f"Warning: could not add {_col} to users:", _e)
-
-try:
-    execute_query("""
-        CREATE TABLE IF NOT EXISTS job_hours (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            hours NUMERIC(6,2) NOT NULL,
-            work_date DATE,
-            notes TEXT,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        )
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not ensure job_hours table:", _e)
-
-try:
-    execute_query("""
-        CREATE TABLE IF NOT EXISTS payments (
-            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-            job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
-            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-            amount DECIMAL(10,2) NOT NULL,
-            payment_type VARCHAR(50) DEFAULT 'deposit',
-            notes TEXT,
-            paid_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        )
-    """, fetch=False)
-except Exception as _e:
-    print("Warning: could not ensure payments table:", _e)
-
-try:
-    execute_query(
-        "ALTER TABLE estimates ADD COLUMN IF NOT EXISTS estimate_type VARCHAR(20) DEFAULT 'quote'",
-        fetch=False
-    )
-except Exception as _e:
-    print("Warning: could not add estimate_type column:", _e)
-
-for _col, _def in [
-    ("contract_terms",       "TEXT"),
-    ("contract_extra_rules", "TEXT"),
-    ("contract_language",    "VARCHAR(5) DEFAULT 'en'"),
-]:
-    try:
-        execute_query(f"ALTER TABLE estimates ADD COLUMN IF NOT EXISTS {_col} {_def}", fetch=False)
-    except Exception as _e:
-        print(f"Warning: could not add {_col} to estimates:", _e)
-
-try:
-    execute_query(
-        "ALTER TABLE files ADD COLUMN IF NOT EXISTS include_in_package BOOLEAN DEFAULT TRUE",
-        fetch=False
-    )
-except Exception as _e:
-    print("Warning: could not add include_in_package to files:", _e)
+# Schema changes are applied by `python migrate.py` as a release step; here
+# we only check (one query) that the database has caught up with the code.
+check_schema()
 
 def send_email(to_addr, subject, body_html):
     """Send email via SMTP. Silently skips if SMTP_HOST env var is not set."""
@@ -257,19 +141,54 @@ def _sorted_thicknesses(thicknesses):
         key=lambda t: (THICKNESS_ORDER.index(t) if t in THICKNESS_ORDER else len(THICKNESS_ORDER), t)
     )
 
+# The job row and its parts are read by most job pages, so they go through
+# query_cache under the job's tag; every write to jobs/parts/cut_sheets
+# invalidates that tag. Columns are listed rather than `SELECT *` so a column
+# added by a migration doesn't change the result type of statements that
+# running workers have already prepared.
+OWNED_JOB_SQL = (
+    "SELECT id, user_id, client_id, client_name, final_price, status, phone, email, address, notes, "
+    "created_at, updated_at FROM jobs WHERE id = %s AND user_id = %s"
+)
+JOB_PARTS_SQL = (
+    "SELECT id, job_id, width, height, thickness, material, quantity, created_at "
+    "FROM parts WHERE job_id = %s ORDER BY created_at"
+)
+
+def _owned_job(job_id, user_id):
+    return cached_single(OWNED_JOB_SQL, (job_id, user_id), tags=(job_tag(job_id),))
+
+def _job_parts(job_id):
+    return cached_query(JOB_PARTS_SQL, (job_id,), tags=(job_tag(job_id),))
+
+# Finds or creates the user's client by name (clients.name_key ignores case
+# and outer spaces) as a CTE yielding its id: WITH client AS (UPSERT_CLIENT).
+# Contact details given here replace the stored ones; blanks keep them.
+UPSERT_CLIENT = """
+    INSERT INTO clients (user_id, name, email, phone, address)
+    VALUES (%s, trim(%s), NULLIF(trim(%s), ''), NULLIF(trim(%s), ''), NULLIF(trim(%s), ''))
+    ON CONFLICT (user_id, name_key) DO UPDATE SET
+        name = EXCLUDED.name,
+        email = COALESCE(EXCLUDED.email, clients.email),
+        phone = COALESCE(EXCLUDED.phone, clients.phone),
+        address = COALESCE(EXCLUDED.address, clients.address)
+    RETURNING id"""
+
 def _optimized_sheets_by_thickness(job_id, panel_width=96, panel_height=48):
     """Fetch a job's parts, grouped by material thickness, and run the cut
     optimizer on each group. Returns an ordered list of (thickness, sheet)
     tuples — shared by cut sheet image generation and the printable checklist
     so both always agree on the same layout."""
-    parts = execute_query("SELECT * FROM parts WHERE job_id = %s ORDER BY created_at", (job_id,), fetch=True)
+    parts = _job_parts(job_id)
     if not parts:
         return []
 
+    # Rows carry a quantity; the optimizer places pieces, so this is the one
+    # place a row is expanded into its physical pieces.
     groups = defaultdict(list)
     for p in parts:
         thickness = p.get('thickness') or '3/4'
-        groups[thickness].append((float(p['width']), float(p['height'])))
+        groups[thickness].extend([(float(p['width']), float(p['height']))] * int(p.get('quantity') or 1))
 
     result = []
     for thickness in _sorted_thicknesses(groups.keys()):
@@ -280,32 +199,59 @@ def _optimized_sheets_by_thickness(job_id, panel_width=96, panel_height=48):
     return result
 
 def regenerate_cut_sheets(job_id, panel_width=96, panel_height=48):
-    """(Re)build a job's cut sheet images, grouped by material thickness so
-    each sheet is labeled with the stock it actually represents — parts of
-    different thicknesses never come from the same physical sheet."""
-    execute_query("DELETE FROM cut_sheets WHERE job_id = %s", (job_id,), fetch=False)
+    """(Re)build a job's cut plan, grouped by material thickness so each sheet
+    is labeled with the stock it actually represents — parts of different
+    thicknesses never come from the same physical sheet."""
     thickness_sheets = _optimized_sheets_by_thickness(job_id, panel_width, panel_height)
 
-    if not thickness_sheets:
-        return []
-
+    # Only the plan is stored here; sheet_image renders each PNG (and its
+    # variants) the first time it's requested, so no parts write pays for
+    # rasterizing sheets nobody may look at.
     sheet_images = []
     for i, (thickness, sheet) in enumerate(thickness_sheets, start=1):
-        imgs = draw_sheets_to_files(
+        sheet_images.extend(sheet_records(
             [sheet], f"static/sheets/{job_id}",
             start_index=i, label_prefix=f'{thickness}"'
-        )
-        sheet_images.extend(imgs)
+        ))
 
+    for n, img in enumerate(sheet_images, start=1):
+        img["sheet_number"] = n
     cut_sheet_rows = [
-        (job_id, src, label, n) for n, (src, label) in enumerate(sheet_images, start=1)
+        (job_id, img["src"], img["label"], img["sheet_number"], img["plan_hash"],
+         json.dumps(img["layout"]), img["thumb_src"], img["medium_src"])
+        for img in sheet_images
     ]
-    execute_batch_insert(
-        "INSERT INTO cut_sheets (job_id, src, label, sheet_number) VALUES %s",
-        cut_sheet_rows
-    )
+    # One transaction, so a concurrent reader never sees the job with its old
+    # sheets gone and the new ones not yet written.
+    with transaction() as tx:
+        tx.execute("DELETE FROM cut_sheets WHERE job_id = %s", (job_id,))
+        if cut_sheet_rows:
+            tx.execute_batch_insert(
+                "INSERT INTO cut_sheets (job_id, src, label, sheet_number, plan_hash, layout, thumb_src, medium_src) VALUES %s",
+                cut_sheet_rows
+            )
+    invalidate(job_tag(job_id))
     return sheet_images
 
+def _sheet_image_view(job_id, row):
+    """Template dict for a cut_sheets row, with URLs for the full-size image
+    and its thumb/medium variants. Rows written before layouts were persisted
+    have no plan_hash and can only be served full-size from static/."""
+    view = {"src": row["src"], "label": row["label"], "sheet_number": row.get("sheet_number")}
+    if not row.get("plan_hash") or not row.get("layout"):
+        url = f"/static/{row['src']}"
+        return dict(view, url=url, thumb_url=url, medium_url=url)
+    # The stored plan_hash is from whichever RENDER_VERSION planned the sheet;
+    # hashing the layout again moves URLs to the current drawing after a bump
+    layout = row["layout"] if isinstance(row["layout"], dict) else json.loads(row["layout"])
+    digest = layout_hash(layout)
+    for key, variant in [("url", None), ("thumb_url", "thumb"), ("medium_url", "medium")]:
+        view[key] = url_for(
+            "sheet_image", job_id=str(job_id),
+            sheet_hash=variant_name(digest, variant), ext="png"
+        )
+    return view
+
 def build_cut_checklist(job_id, panel_width=96, panel_height=48):
     """Same layout as the cut sheet images, but as plain part lists — meant
     to be printed and checked off at the saw instead of squinting at a PNG."""
@@ -322,33 +268,14 @@ def build_cut_checklist(job_id, panel_width=96, panel_height=48):
         })
     return checklist
 
-def check_material_stock(user_id, job_id, panel_width=96, panel_height=48):
-    """Estimate sheets needed per thickness for this job and compare against
-    the user's Stock Inventory (fuzzy-matched by thickness appearing in the
-    stock item's name, since stock items don't have a dedicated thickness
-    column)."""
-    parts = execute_query("SELECT thickness, width, height FROM parts WHERE job_id = %s", (job_id,), fetch=True)
-    if not parts:
-        return []
-
-    thickness_areas = {}
-    for p in parts:
-        t = p['thickness'] or '3/4'
-        area = float(p['width']) * float(p['height'])
-        thickness_areas[t] = thickness_areas.get(t, 0) + area
-
-    sheet_area = float(panel_width) * float(panel_height)
+def _material_check(rows):
     results = []
-    for thickness in _sorted_thicknesses(thickness_areas.keys()):
-        needed = math.ceil(thickness_areas[thickness] / sheet_area * 1.15)  # 15% waste, matches the estimate prefill
-        row = execute_single(
-            "SELECT COALESCE(SUM(quantity), 0) as total, COUNT(*) as matches FROM stocks WHERE user_id = %s AND name ILIKE %s",
-            (user_id, f"%{thickness}%")
-        )
-        tracked = bool(row and int(row["matches"]) > 0)
-        on_hand = int(row["total"]) if tracked else 0
+    for row in rows:
+        needed = int(row["needed"])
+        tracked = int(row["matches"]) > 0
+        on_hand = int(row["on_hand"]) if tracked else 0
         results.append({
-            "thickness": thickness,
+            "thickness": row["thickness"],
             "needed": needed,
             "on_hand": on_hand,
             "tracked": tracked,
@@ -508,6 +435,30 @@ def reset_password(token):
 
 # ===== MAIN ROUTES =====
 
+# Seconds the landing page's per-user stats may be served from query_cache
+DASHBOARD_CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "15"))
+
+def _dashboard_stats_query(user_id):
+    """cached_reads entry for the per-user totals on the landing page and
+    above the jobs list (cache it under user_tag)."""
+    urgent_threshold = datetime.now().date() + timedelta(days=3)
+    return ("""
+        SELECT COUNT(*) AS total_jobs,
+               COALESCE(SUM(final_price), 0) AS total_revenue,
+               COUNT(*) FILTER (WHERE COALESCE(final_price, 0) = 0) AS pending_quotes,
+               COUNT(*) FILTER (WHERE status = 'completed') AS completed_jobs,
+               COUNT(*) FILTER (WHERE status = 'in_progress') AS in_progress_jobs,
+               (SELECT COUNT(*) FROM deadlines
+                 WHERE user_id = %s AND hard_deadline IS NOT NULL AND hard_deadline <= %s) AS urgent_jobs
+        FROM jobs WHERE user_id = %s
+    """, (user_id, urgent_threshold, user_id), "one")
+
+def _dashboard_stats(row):
+    stats = {key: int(row[key]) for key in
+             ("total_jobs", "pending_quotes", "urgent_jobs", "completed_jobs", "in_progress_jobs")}
+    stats["total_revenue"] = float(row["total_revenue"])
+    return stats
+
 @app.route("/")
 def home():
     user_id = session.get("user_id")
@@ -525,70 +476,27 @@ def home():
 
     if user_id:
         try:
-            all_jobs = execute_query(
-                "SELECT id, client_name, final_price, status, created_at FROM jobs WHERE user_id = %s",
-                (user_id,),
-                fetch=True
-            )
-            
-            stats["total_jobs"] = len(all_jobs)
-            stats["total_revenue"] = sum(float(job.get("final_price", 0) or 0) for job in all_jobs)
-            stats["pending_quotes"] = len([job for job in all_jobs if not job.get("final_price")])
-            stats["completed_jobs"] = len([job for job in all_jobs if job.get("status") == "completed"])
-            stats["in_progress_jobs"] = len([job for job in all_jobs if job.get("status") == "in_progress"])
-
-            # Get upcoming deadlines
-            deadlines = execute_query(
-                "SELECT job_id, hard_deadline FROM deadlines WHERE user_id = %s AND hard_deadline IS NOT NULL ORDER BY hard_deadline",
-                (user_id,),
-                fetch=True
-            )
-            
-            today = datetime.now().date()
-            urgent_threshold = today + timedelta(days=3)
-            
-            urgent_job_ids = []
-            for deadline in deadlines:
-                if deadline.get("hard_deadline"):
-                    deadline_date = deadline["hard_deadline"]
-                    if isinstance(deadline_date, str):
-                        deadline_date = datetime.fromisoformat(deadline_date.replace('Z', '+00:00')).date()
-                    if deadline_date <= urgent_threshold:
-                        urgent_job_ids.append(str(deadline["job_id"]))
-            
-            stats["urgent_jobs"] = len(urgent_job_ids)
-            
-            # Get upcoming deadlines with job info
-            if deadlines:
-                job_ids = [str(d["job_id"]) for d in deadlines[:5]]
-                if job_ids:
-                    placeholders = ','.join(['%s'] * len(job_ids))
-                    jobs_info = execute_query(
-                        f"SELECT id, client_name FROM jobs WHERE id::text IN ({placeholders})",
-                        tuple(job_ids),
-                        fetch=True
-                    )
-                    
-                    job_map = {str(j["id"]): j["client_name"] for j in jobs_info}
-                    
-                    for d in deadlines[:5]:
-                        if d.get("hard_deadline"):
-                            upcoming_deadlines.append({
-                                "job_id": d["job_id"],
-                                "client_name": job_map.get(str(d["job_id"]), "Unknown"),
-                                "hard_deadline": d["hard_deadline"]
-                            })
-
-            # Recent jobs
-            recent_jobs = []
-            sorted_jobs = sorted(all_jobs, key=lambda x: x.get("created_at", datetime.min), reverse=True)
-            for job in sorted_jobs[:5]:
-                recent_jobs.append({
-                    "id": job["id"],
-                    "client_name": job["client_name"],
-                    "status": job.get("status", "draft"),
-                    "created_at": job["created_at"]
-                })
+            # Three bounded queries on one connection, however long the
+            # user's history; cached briefly per user, and every write to a
+            # job's name/price/status/deadline bumps the user's tag.
+            data = cached_reads({
+                "stats": _dashboard_stats_query(user_id),
+                "deadlines": ("""
+                    SELECT d.job_id, d.hard_deadline, COALESCE(j.client_name, 'Unknown') AS client_name
+                    FROM deadlines d LEFT JOIN jobs j ON j.id = d.job_id
+                    WHERE d.user_id = %s AND d.hard_deadline IS NOT NULL
+                    ORDER BY d.hard_deadline LIMIT 5
+                """, (user_id,)),
+                "recent": (
+                    "SELECT id, client_name, COALESCE(status, 'draft') AS status, created_at FROM jobs "
+                    "WHERE user_id = %s ORDER BY created_at DESC LIMIT 5",
+                    (user_id,)
+                ),
+            }, tags=(user_tag(user_id),), cached=("stats", "deadlines", "recent"), ttl=DASHBOARD_CACHE_TTL)
+
+            stats = _dashboard_stats(data["stats"])
+            upcoming_deadlines = data["deadlines"]
+            recent_jobs = data["recent"]
 
         except Exception as e:
             capture_exception(e)
@@ -632,8 +540,11 @@ def create_job():
 
         job_uuid = str(uuid.uuid4())
         execute_query(
-            "INSERT INTO jobs (id, user_id, client_name, status, phone, email, address, notes) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-            (job_uuid, user_id, client_name, "draft", phone or None, email or None, address or None, notes or None),
+            f"""WITH client AS ({UPSERT_CLIENT})
+                INSERT INTO jobs (id, user_id, client_id, client_name, status, phone, email, address, notes)
+                SELECT %s, %s, client.id, %s, %s, %s, %s, %s, %s FROM client""",
+            (user_id, client_name, email, phone, address,
+             job_uuid, user_id, client_name, "draft", phone or None, email or None, address or None, notes or None),
             fetch=False
         )
 
@@ -646,6 +557,7 @@ def create_job():
                  client_name),
                 fetch=False
             )
+        invalidate(user_tag(user_id))
 
         # Import parts + accessories from template if selected
         if template_id:
@@ -656,15 +568,13 @@ def create_job():
             if tpl:
                 tpl_parts = tpl['parts'] if isinstance(tpl['parts'], list) else json.loads(tpl['parts'] or '[]')
                 tpl_accs  = tpl['accessories'] if isinstance(tpl['accessories'], list) else json.loads(tpl['accessories'] or '[]')
-                has_parts = False
-                for p in tpl_parts:
-                    for _ in range(int(p.get('quantity', 1))):
-                        execute_query(
-                            "INSERT INTO parts (job_id, width, height, thickness, material) VALUES (%s, %s, %s, %s, %s)",
-                            (job_uuid, p['width'], p['height'], p.get('thickness','3/4'), p.get('material','Plywood')),
-                            fetch=False
-                        )
-                        has_parts = True
+                # One row per template line; large templates go through COPY
+                has_parts = execute_batch_insert(
+                    "INSERT INTO parts (job_id, width, height, thickness, material, quantity) VALUES %s",
+                    ((job_uuid, p['width'], p['height'], p.get('thickness','3/4'), p.get('material','Plywood'),
+                      max(int(p.get('quantity', 1)), 1))
+                     for p in tpl_parts)
+                ) > 0
                 for a in tpl_accs:
                     execute_query(
                         "INSERT INTO job_accessories (job_id, name, quantity, unit, unit_price) VALUES (%s, %s, %s, %s, %s)",
@@ -699,16 +609,13 @@ def job_step_parts(job_id):
         return redirect(url_for("login"))
 
     user_id = session["user_id"]
-    job = execute_single("SELECT * FROM jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+    job = _owned_job(job_id, user_id)
     if not job:
         flash("Job not found.", "danger")
         return redirect(url_for("jobs"))
 
     if request.method == "GET":
-        existing_parts = execute_query(
-            "SELECT * FROM parts WHERE job_id = %s ORDER BY created_at",
-            (job_id,), fetch=True
-        )
+        existing_parts = _job_parts(job_id)
         return render_template("job_parts.html", job=job, parts=existing_parts)
 
     # POST — save files + parts, regenerate cut sheets
@@ -739,15 +646,16 @@ def job_step_parts(job_id):
                 w, h = float(widths[i]), float(heights[i])
                 qty = int(quantities[i]) if i < len(quantities) and quantities[i] else 1
                 thickness = thicknesses[i] if i < len(thicknesses) and thicknesses[i] else "3/4"
-                for _ in range(qty):
-                    new_part_rows.append((job_id, w, h, thickness, "Plywood"))
+                if qty > 0:
+                    new_part_rows.append((job_id, w, h, thickness, "Plywood", qty))
             except ValueError:
                 continue
 
     execute_batch_insert(
-        "INSERT INTO parts (job_id, width, height, thickness, material) VALUES %s",
+        "INSERT INTO parts (job_id, width, height, thickness, material, quantity) VALUES %s",
         new_part_rows
     )
+    invalidate(job_tag(job_id))
 
     # Regenerate cut sheets from all parts for this job
     try:
@@ -846,42 +754,47 @@ def jobs():
     user_id = session["user_id"]
     q = request.args.get("q", "").strip()
     status_filter = request.args.get("status", "").strip()
+    client_id = request.args.get("client_id", "").strip()
+    if client_id:
+        try:
+            client_id = str(uuid.UUID(client_id))
+        except ValueError:
+            flash("Client not found.", "warning")
+            return redirect(url_for("clients"))
+
+    size = pagination.page_size(request.args.get("per_page"))
 
     try:
-        base_q = "SELECT id, client_name, email, phone, final_price, status, created_at FROM jobs WHERE user_id = %s"
-        params = [user_id]
-        if q:
-            base_q += " AND client_name ILIKE %s"
-            params.append(f"%{q}%")
-        if status_filter:
-            base_q += " AND status = %s"
-            params.append(status_filter)
-        base_q += " ORDER BY created_at DESC"
-        job_data = execute_query(base_q, tuple(params), fetch=True)
-        job_ids = [str(j["id"]) for j in job_data]
-
-        counts = {jid: {"3/4": 0, "1/2": 0, "1/4": 0, "Other": 0, "total": 0} for jid in job_ids}
-        if job_ids:
-            # Use IN clause instead of ANY for better compatibility
-            placeholders = ','.join(['%s'] * len(job_ids))
-            parts_data = execute_query(
-                f"SELECT job_id, material FROM parts WHERE job_id::text IN ({placeholders})",
-                tuple(job_ids),
-                fetch=True
-            )
-            for p in parts_data:
-                jid = str(p.get("job_id"))
-                mat = (p.get("material") or "").strip()
-                key = mat if mat in ("3/4", "1/2", "1/4") else "Other"
-                if jid in counts:
-                    counts[jid][key] += 1
-                    counts[jid]["total"] += 1
+        (inner, inner_params, keys), (count_sql, count_params) = queries.job_list(
+            user_id, q, status_filter, client_id)
+        cursor = pagination.decode_cursor(request.args.get("after"), len(keys))
+        page_sql, page_params = pagination.page_query(inner, keys, cursor, size)
+        data = cached_reads({
+            "jobs": (page_sql, (*inner_params, *page_params)),
+            "estimate": (pagination.estimate_sql(count_sql), tuple(count_params), "one"),
+            "stats": _dashboard_stats_query(user_id),
+            **({"client": ("SELECT id, name FROM clients WHERE id = %s AND user_id = %s",
+                           (client_id, user_id), "one")} if client_id else {}),
+        }, tags=(user_tag(user_id),), cached=("stats",), ttl=DASHBOARD_CACHE_TTL)
+        client = data.get("client")
+        if client_id and not client:
+            flash("Client not found.", "warning")
+            return redirect(url_for("clients"))
+        job_data, next_cursor = pagination.split_page(data["jobs"], size, keys)
+        total, total_exact = pagination.total(data["estimate"], job_data, cursor is None, next_cursor)
+        next_url = url_for("jobs", q=q or None, status=status_filter or None, client_id=client_id or None,
+                           per_page=request.args.get("per_page"), after=next_cursor) if next_cursor else None
 
         for j in job_data:
-            j["part_counts"] = counts.get(str(j["id"]), {"3/4": 0, "1/2": 0, "1/4": 0, "Other": 0, "total": 0})
+            j["part_counts"] = {
+                "3/4": j["pieces_3_4"], "1/2": j["pieces_1_2"], "1/4": j["pieces_1_4"],
+                "Other": j["pieces_other"], "total": j["total_pieces"],
+            }
 
         current_date = datetime.now().date()
-        return render_template("jobs.html", jobs=job_data, current_date=current_date, q=q, status_filter=status_filter)
+        return render_template("jobs.html", jobs=job_data, current_date=current_date, q=q, status_filter=status_filter, client=client,
+                               stats=_dashboard_stats(data["stats"]), total=total, total_exact=total_exact,
+                               next_url=next_url)
 
     except Exception as e:
         capture_exception(e)
@@ -898,54 +811,40 @@ def job_details(job_id):
     user_id = session["user_id"]
     
     try:
-        # Get job details
-        job = execute_single(
-            "SELECT * FROM jobs WHERE id = %s AND user_id = %s",
-            (job_id, user_id)
-        )
-        
+        # Every query here is independent, so they share one connection via
+        # execute_reads; the ownership check on `job` still gates the page.
+        data = cached_reads({
+            "job": (OWNED_JOB_SQL, (job_id, user_id), "one"),
+            "parts": (JOB_PARTS_SQL, (job_id,)),
+            "deadline": ("SELECT * FROM deadlines WHERE job_id = %s", (job_id,), "one"),
+            "files": ("SELECT * FROM files WHERE job_id = %s ORDER BY uploaded_at", (job_id,)),
+            "estimates": ("SELECT * FROM estimates WHERE job_id = %s ORDER BY created_at DESC", (job_id,)),
+            "accessories": ("SELECT * FROM job_accessories WHERE job_id = %s ORDER BY created_at", (job_id,)),
+            "cut_sheets": ("SELECT * FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number", (job_id,)),
+            "payments": ("SELECT * FROM payments WHERE job_id = %s ORDER BY paid_at DESC", (job_id,)),
+            "hours": (
+                "SELECT * FROM job_hours WHERE job_id = %s ORDER BY work_date DESC NULLS LAST, created_at DESC",
+                (job_id,)
+            ),
+            "stock": queries.material_stock(user_id, job_id),
+        }, tags=(job_tag(job_id),), cached=("job", "parts", "cut_sheets"))
+        job = data["job"]
+
         if not job:
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
-        
-        # Get job parts
-        parts = execute_query(
-            "SELECT * FROM parts WHERE job_id = %s ORDER BY created_at",
-            (job_id,),
-            fetch=True
-        )
-        
-        # Get deadlines
-        deadline = execute_single(
-            "SELECT * FROM deadlines WHERE job_id = %s",
-            (job_id,)
-        )
-        
-        # Get files
-        files = execute_query(
-            "SELECT * FROM files WHERE job_id = %s ORDER BY uploaded_at",
-            (job_id,),
-            fetch=True
-        )
-        
-        # Get estimates
-        estimates = execute_query(
-            "SELECT * FROM estimates WHERE job_id = %s ORDER BY created_at DESC",
-            (job_id,),
-            fetch=True
-        )
 
-        # Get accessories
-        accessories = execute_query(
-            "SELECT * FROM job_accessories WHERE job_id = %s ORDER BY created_at",
-            (job_id,), fetch=True
-        )
+        parts = data["parts"]
+        deadline = data["deadline"]
+        files = data["files"]
+        estimates = data["estimates"]
+        accessories = data["accessories"]
 
         # Group parts by dimensions for the summary card
         part_groups = defaultdict(lambda: {'count': 0, 'first_id': None})
         for p in parts:
             key = (str(p['width']), str(p['height']), p.get('thickness') or '3/4', p.get('material') or 'Plywood')
-            part_groups[key]['count'] += 1
+            part_groups[key]['count'] += int(p['quantity'])
             if part_groups[key]['first_id'] is None:
                 part_groups[key]['first_id'] = str(p['id'])
         grouped_parts = [
@@ -967,40 +866,27 @@ def job_details(job_id):
             if os.path.splitext(f['filename'])[1].lower() in image_exts
         ]
 
-        # Get cut sheets; regenerate if missing from disk (ephemeral filesystem)
-        cut_sheet_rows = execute_query(
-            "SELECT * FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
-            (job_id,), fetch=True
-        )
-        sheet_images = []
-        if cut_sheet_rows:
-            files_missing = any(
-                not os.path.exists(f"static/{row['src']}") for row in cut_sheet_rows
-            )
-            if files_missing and parts:
-                try:
-                    regenerated = regenerate_cut_sheets(job_id)
-                    cut_sheet_rows = [{"src": src, "label": label} for src, label in regenerated]
-                except Exception as _regen_err:
-                    print("Error regenerating cut sheets:", _regen_err)
-            sheet_images = [{"src": row["src"], "label": row["label"]} for row in cut_sheet_rows]
-
-        payments = execute_query(
-            "SELECT * FROM payments WHERE job_id = %s ORDER BY paid_at DESC",
-            (job_id,), fetch=True
-        )
+        # Get cut sheets. Images are rendered on demand by sheet_image, so a
+        # wiped filesystem heals itself on access instead of blocking here;
+        # only legacy rows without a persisted layout need a one-off rebuild.
+        cut_sheet_rows = data["cut_sheets"]
+        if cut_sheet_rows and parts and any(not row.get("plan_hash") for row in cut_sheet_rows):
+            try:
+                cut_sheet_rows = regenerate_cut_sheets(job_id)
+            except Exception as _regen_err:
+                print("Error regenerating cut sheets:", _regen_err)
+        sheet_images = [_sheet_image_view(job_id, row) for row in cut_sheet_rows]
+
+        payments = data["payments"]
         total_paid = sum(float(p['amount']) for p in payments)
         total_estimate = float(job.get('final_price') or 0)
         balance_due = max(total_estimate - total_paid, 0)
 
-        hours_logged = execute_query(
-            "SELECT * FROM job_hours WHERE job_id = %s ORDER BY work_date DESC NULLS LAST, created_at DESC",
-            (job_id,), fetch=True
-        )
+        hours_logged = data["hours"]
         total_hours = sum(float(h['hours']) for h in hours_logged)
         estimated_labor = float(estimates[0]['labor_rate']) if estimates and estimates[0].get('labor_rate') is not None else None
 
-        material_check = check_material_stock(user_id, job_id)
+        material_check = _material_check(data["stock"])
 
         return render_template(
             "job_details.html",
@@ -1056,12 +942,23 @@ def edit_job(job_id):
             address = request.form.get("address", "").strip() or None
             notes   = request.form.get("notes", "").strip() or None
 
-            # Update job
-            execute_query(
-                "UPDATE jobs SET client_name = %s, phone = %s, email = %s, address = %s, notes = %s WHERE id = %s",
-                (client_name, phone, email, address, notes, job_id),
-                fetch=False
-            )
+            # Update job, relinking it to the client now named on it
+            if (client_name or "").strip():
+                execute_query(
+                    f"""WITH client AS ({UPSERT_CLIENT})
+                        UPDATE jobs SET client_id = (SELECT id FROM client), client_name = %s, phone = %s,
+                                        email = %s, address = %s, notes = %s
+                        WHERE id = %s""",
+                    (user_id, client_name, email, phone, address,
+                     client_name, phone, email, address, notes, job_id),
+                    fetch=False
+                )
+            else:
+                execute_query(
+                    "UPDATE jobs SET client_id = NULL, client_name = %s, phone = %s, email = %s, address = %s, notes = %s WHERE id = %s",
+                    (client_name, phone, email, address, notes, job_id),
+                    fetch=False
+                )
             
             # Update or create deadlines
             if deadline:
@@ -1086,6 +983,7 @@ def edit_job(job_id):
                     ),
                     fetch=False
                 )
+            invalidate(job_tag(job_id), user_tag(user_id))
             
             # Handle file uploads
             uploaded_files = request.files.getlist('job_files')
@@ -1133,6 +1031,7 @@ def edit_job(job_id):
                         continue
                 
                 part_index += 1
+            invalidate(job_tag(job_id))
             
             flash("Job updated successfully!", "success")
             return redirect(url_for("job_details", job_id=job_id))
@@ -1158,7 +1057,12 @@ def delete_part(part_id):
         flash("Part not found.", "danger")
         return redirect(url_for("jobs"))
     job_id = str(part['job_id'])
-    execute_query("DELETE FROM parts WHERE id = %s", (part_id,), fetch=False)
+    # Removes one piece: decrement the row, or delete it at its last piece
+    execute_write(
+        """WITH one_less AS (UPDATE parts SET quantity = quantity - 1 WHERE id = %s AND quantity > 1 RETURNING id)
+           DELETE FROM parts WHERE id = %s AND NOT EXISTS (SELECT 1 FROM one_less)""",
+        (part_id, part_id), tags=(job_tag(job_id),)
+    )
     # Regenerate cut sheets from remaining parts
     try:
         regenerate_cut_sheets(job_id)
@@ -1206,7 +1110,7 @@ def save_as_template(job_id):
     part_groups = defaultdict(lambda: {'count': 0})
     for p in parts:
         key = (str(p['width']), str(p['height']), p.get('thickness','3/4'), p.get('material','Plywood'))
-        part_groups[key]['count'] += 1
+        part_groups[key]['count'] += int(p['quantity'])
     parts_json = [
         {'width': k[0], 'height': k[1], 'thickness': k[2], 'material': k[3], 'quantity': v['count']}
         for k, v in part_groups.items()
@@ -1365,7 +1269,7 @@ def cut_checklist(job_id):
     if "user_id" not in session:
         return redirect(url_for("login"))
     user_id = session["user_id"]
-    job = execute_single("SELECT * FROM jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+    job = _owned_job(job_id, user_id)
     if not job:
         flash("Job not found.", "danger")
         return redirect(url_for("jobs"))
@@ -1379,6 +1283,161 @@ def cut_checklist(job_id):
     return render_template("cut_checklist.html", job=job, sheets=sheets)
 
 
+def _compact_num(value):
+    value = round(float(value), 3)
+    return int(value) if value.is_integer() else value
+
+
+def _compact_part(cut):
+    x, y = cut["position"]
+    # rotated is always 0 today — the optimizer never turns parts — but the
+    # slot is part of the wire format so the client needn't change if it does
+    return [_compact_num(x), _compact_num(y), _compact_num(cut["width"]),
+            _compact_num(cut["height"]), cut["part_number"], 1 if cut.get("rotated") else 0]
+
+
+@app.route("/job/<job_id>/layout.json")
+def job_layout_json(job_id):
+    """Compact cut plan for the client-side canvas renderer: per sheet, the
+    panel size and [x, y, w, h, part_no, rotated] rows. The ETag is derived
+    from the sheets' plan hashes, so unchanged plans revalidate with a 304."""
+    if "user_id" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    user_id = session["user_id"]
+    job = execute_single("SELECT id FROM jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    rows = execute_query(
+        "SELECT sheet_number, plan_hash, layout FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
+        (job_id,), fetch=True
+    )
+    if any(not row.get("layout") or not row.get("plan_hash") for row in rows):
+        rows = regenerate_cut_sheets(job_id)
+
+    plan_hash = hashlib.sha256(
+        ",".join(row["plan_hash"] for row in rows).encode()
+    ).hexdigest()[:32]
+    if plan_hash in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        sheets = []
+        for row in rows:
+            layout = row["layout"] if isinstance(row["layout"], dict) else json.loads(row["layout"])
+            sheets.append({
+                "n": row["sheet_number"],
+                "t": layout.get("label_prefix"),
+                "panel": [_compact_num(v) for v in layout["panel_size"]],
+                "parts": [_compact_part(cut) for cut in layout["cut_plan"]],
+            })
+        response = make_response(json.dumps({"hash": plan_hash, "sheets": sheets}, separators=(",", ":")))
+        response.mimetype = "application/json"
+    response.set_etag(plan_hash)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/job/<job_id>/cut-pack")
+def download_cut_pack(job_id):
+    if "user_id" not in session:
+        return redirect(url_for("login"))
+    user_id = session["user_id"]
+    job = execute_single("SELECT * FROM jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+    if not job:
+        flash("Job not found.", "danger")
+        return redirect(url_for("jobs"))
+    try:
+        rows = execute_query(
+            "SELECT layout FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
+            (job_id,), fetch=True
+        )
+        if any(not row.get("layout") for row in rows):
+            # Legacy rows from before layouts were persisted
+            rows = regenerate_cut_sheets(job_id)
+        layouts = [
+            row["layout"] if isinstance(row["layout"], dict) else json.loads(row["layout"])
+            for row in rows
+        ]
+        if not layouts:
+            flash("No cut sheets yet — add parts to this job first.", "warning")
+            return redirect(url_for("job_details", job_id=job_id))
+        buffer = build_cut_pack_pdf(job, layouts)
+    except Exception as e:
+        capture_exception(e)
+        print("Error generating cut pack PDF:", e)
+        flash("Could not generate the cut pack.", "danger")
+        return redirect(url_for("job_details", job_id=job_id))
+
+    safe_client = (job.get('client_name') or 'unnamed').replace(' ', '_')
+    return send_file(
+        buffer,
+        as_attachment=True,
+        download_name=f"cut_pack_{safe_client}_{job_id[:8]}.pdf",
+        mimetype='application/pdf'
+    )
+
+
+# ===== CUT SHEET IMAGES =====
+
+@app.route("/sheets/<job_id>/<sheet_hash>.<ext>")
+def sheet_image(job_id, sheet_hash, ext):
+    """Serve a cut sheet image, rendering it from the persisted layout the
+    first time it's asked for. The URL is content-addressed by plan_hash, so
+    the response never changes and browsers can cache it forever.
+    `<hash>-thumb.png` / `<hash>-medium.png` are downscaled from the full PNG."""
+    try:
+        job_id = str(uuid.UUID(job_id))
+    except ValueError:
+        return "Sheet not found", 404
+    digest, _, variant = sheet_hash.partition("-")
+    if (ext not in SHEET_FORMATS or not digest
+            or not all(c in "0123456789abcdef" for c in digest)
+            or (variant and (variant not in SHEET_VARIANTS or ext != "png"))):
+        return "Sheet not found", 404
+
+    etag = f"{sheet_hash}.{ext}"
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        sheet_dir = f"static/sheets/{job_id}"
+        file_path = f"{sheet_dir}/{sheet_hash}.{ext}"
+        source_path = f"{sheet_dir}/{digest}.{ext}"
+        if not os.path.exists(file_path):
+            try:
+                if not os.path.exists(source_path):
+                    # Match on the layout's current hash, not the stored
+                    # plan_hash, which predates any RENDER_VERSION bump
+                    rows = execute_query(
+                        "SELECT layout FROM cut_sheets WHERE job_id = %s AND layout IS NOT NULL",
+                        (job_id,), fetch=True
+                    )
+                    layouts = (r["layout"] if isinstance(r["layout"], dict) else json.loads(r["layout"]) for r in rows)
+                    layout = next((l for l in layouts if layout_hash(l) == digest), None)
+                    if layout is None:
+                        return "Sheet not found", 404
+                    os.makedirs(sheet_dir, exist_ok=True)
+                    bytes_saved = draw_layout(layout, source_path, fmt=ext)
+                    if bytes_saved:
+                        print(f"Cut sheet {digest} for job {job_id}: PNG encoding saved {bytes_saved / 1024:.1f} KB")
+                if variant:
+                    derive_variant(source_path, file_path, variant)
+            except Exception as e:
+                capture_exception(e)
+                print("Error rendering cut sheet:", e)
+                return "Could not render sheet", 500
+        response = send_file(
+            os.path.abspath(file_path), mimetype=SHEET_FORMATS[ext],
+            conditional=False, etag=False, max_age=31536000
+        )
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
 # ===== INVOICE CONVERSION =====
 
 @app.route("/estimate/<estimate_id>/to-invoice", methods=["POST"])
@@ -1494,11 +1553,11 @@ def client_package_generate(estimate_id):
         image_files = [f for f in files if os.path.splitext(f['filename'])[1].lower() in image_exts]
 
         selected_ids = set(request.form.getlist("photo_ids"))
-        for f in image_files:
-            include = str(f['id']) in selected_ids
+        if image_files:
             execute_query(
-                "UPDATE files SET include_in_package = %s WHERE id = %s",
-                (include, f['id']), fetch=False
+                f"UPDATE files SET include_in_package = ({any_uuid('id')}) WHERE {any_uuid('id')}",
+                (uuid_array(f['id'] for f in image_files if str(f['id']) in selected_ids),
+                 uuid_array(f['id'] for f in image_files)), fetch=False
             )
 
         images = [{'path': f['storage_path']} for f in image_files if str(f['id']) in selected_ids]
@@ -1529,20 +1588,43 @@ def clients():
     if "user_id" not in session:
         return redirect(url_for("login"))
     user_id = session["user_id"]
-    jobs = execute_query(
-        "SELECT id, client_name, email, phone, status, final_price, created_at FROM jobs WHERE user_id = %s ORDER BY client_name, created_at DESC",
-        (user_id,), fetch=True
+    size = pagination.page_size(request.args.get("per_page"))
+    (inner, inner_params, keys), (count_sql, count_params) = queries.client_list(user_id)
+    cursor = pagination.decode_cursor(request.args.get("after"), len(keys))
+    page_sql, page_params = pagination.page_query(inner, keys, cursor, size)
+    data = execute_reads({
+        "clients": (page_sql, (*inner_params, *page_params)),
+        "estimate": (pagination.estimate_sql(count_sql), tuple(count_params), "one"),
+    })
+    clients_list, next_cursor = pagination.split_page(data["clients"], size, keys)
+    total, total_exact = pagination.total(data["estimate"], clients_list, cursor is None, next_cursor)
+    # Each card lists its newest jobs; one query for the whole page
+    by_client = {c["id"]: c for c in clients_list}
+    for c in clients_list:
+        c["jobs"] = []
+    if by_client:
+        for j in execute_query(*queries.client_jobs(by_client), fetch=True):
+            by_client[j["client_id"]]["jobs"].append(j)
+    next_url = url_for("clients", per_page=request.args.get("per_page"), after=next_cursor) if next_cursor else None
+    return render_template("clients.html", clients=clients_list, total=total, total_exact=total_exact,
+                           next_url=next_url)
+
+
+@app.route("/clients/suggest")
+def client_suggestions():
+    """Up to 8 of the user's clients whose name starts with ?q=, with their
+    contact details, for the new-job form's autocomplete."""
+    if "user_id" not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    q = request.args.get("q", "").strip().lower()
+    if not q:
+        return jsonify([])
+    rows = execute_query(
+        "SELECT name, email, phone, address FROM clients "
+        "WHERE user_id = %s AND name_key LIKE %s ORDER BY name_key LIMIT 8",
+        (session["user_id"], queries.like_escape(q) + "%"), fetch=True
     )
-    # Group by client_name
-    from collections import OrderedDict
-    grouped = OrderedDict()
-    for j in jobs:
-        key = (j['client_name'] or '').strip().lower()
-        if key not in grouped:
-            grouped[key] = {'name': j['client_name'], 'email': j['email'], 'phone': j['phone'], 'jobs': []}
-        grouped[key]['jobs'].append(j)
-    clients_list = list(grouped.values())
-    return render_template("clients.html", clients=clients_list)
+    return jsonify(rows)
 
 
 # ===== SEND DEADLINE REMINDER =====
@@ -1596,20 +1678,35 @@ def _calc_template_price(tpl):
 @app.route("/catalog")
 def catalog():
     q = request.args.get("q", "").strip()
+    size = pagination.page_size(request.args.get("per_page"))
     if q:
-        templates = execute_query(
-            "SELECT * FROM job_templates WHERE name ILIKE %s OR description ILIKE %s ORDER BY name",
-            (f"%{q}%", f"%{q}%"), fetch=True
-        )
+        search_where, _ = queries.search_clause(queries.TEMPLATE_SEARCH_TEXT)
+        inner = f"SELECT *, {queries.search_rank(queries.TEMPLATE_SEARCH_TEXT)} AS rank FROM job_templates WHERE {search_where}"
+        inner_params, where_params = [q, *queries.search_params(q)], queries.search_params(q)
+        count_sql = f"SELECT 1 FROM job_templates WHERE {search_where}"
+        keys = [("rank", "DESC"), ("name", "ASC"), ("id", "ASC")]
     else:
-        templates = execute_query("SELECT * FROM job_templates ORDER BY name", fetch=True)
+        inner, inner_params, where_params = "SELECT * FROM job_templates", [], []
+        count_sql = "SELECT 1 FROM job_templates"
+        keys = [("name", "ASC"), ("id", "ASC")]
+    cursor = pagination.decode_cursor(request.args.get("after"), len(keys))
+    page_sql, page_params = pagination.page_query(inner, keys, cursor, size)
+    data = execute_reads({
+        "templates": (page_sql, (*inner_params, *page_params)),
+        "estimate": (pagination.estimate_sql(count_sql), tuple(where_params), "one"),
+    })
+    templates, next_cursor = pagination.split_page(data["templates"], size, keys)
+    total, total_exact = pagination.total(data["estimate"], templates, cursor is None, next_cursor)
+    next_url = url_for("catalog", q=q or None, per_page=request.args.get("per_page"),
+                       after=next_cursor) if next_cursor else None
     catalog_items = []
     for t in templates:
         t['parts']       = t['parts'] if isinstance(t['parts'], list) else json.loads(t['parts'] or '[]')
         t['accessories'] = t['accessories'] if isinstance(t['accessories'], list) else json.loads(t['accessories'] or '[]')
         t['base_price']  = _calc_template_price(t)
         catalog_items.append(t)
-    return render_template("catalog.html", templates=catalog_items, q=q)
+    return render_template("catalog.html", templates=catalog_items, q=q, total=total, total_exact=total_exact,
+                           next_url=next_url)
 
 
 @app.route("/catalog/<template_id>")
@@ -1641,7 +1738,7 @@ def catalog_detail(template_id):
             "SELECT * FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
             (job_id,), fetch=True
         )
-        cut_sheets = [{"src": row["src"], "label": row["label"]} for row in cut_sheet_rows]
+        cut_sheets = [_sheet_image_view(job_id, row) for row in cut_sheet_rows]
 
     return render_template(
         "catalog_detail.html",
@@ -1790,14 +1887,13 @@ def job_gallery(job_id):
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
         
-        # Get all sheet images for this job
-        sheet_folder = f"static/sheets/{job_id}"
-        sheet_images = []
-        
-        if os.path.exists(sheet_folder):
-            for file in os.listdir(sheet_folder):
-                if file.endswith(('.png', '.jpg', '.jpeg')):
-                    sheet_images.append(f"sheets/{job_id}/{file}")
+        # Sheet images come from cut_sheets rather than a directory listing,
+        # which would also pick up every thumb/medium variant on disk
+        cut_sheet_rows = execute_query(
+            "SELECT * FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
+            (job_id,), fetch=True
+        )
+        sheet_images = [_sheet_image_view(job_id, row) for row in cut_sheet_rows]
         
         return render_template("job_gallery.html", job=job, sheet_images=sheet_images)
         
@@ -1826,15 +1922,16 @@ def delete_job(job_id):
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
         
-        # Delete related records first (foreign key constraints)
-        execute_query("DELETE FROM files WHERE job_id = %s", (job_id,), fetch=False)
-        execute_query("DELETE FROM estimate_items WHERE estimate_id IN (SELECT id FROM estimates WHERE job_id = %s)", (job_id,), fetch=False)
-        execute_query("DELETE FROM estimates WHERE job_id = %s", (job_id,), fetch=False)
-        execute_query("DELETE FROM parts WHERE job_id = %s", (job_id,), fetch=False)
-        execute_query("DELETE FROM deadlines WHERE job_id = %s", (job_id,), fetch=False)
-        
-        # Delete the job
-        execute_query("DELETE FROM jobs WHERE id = %s", (job_id,), fetch=False)
+        # Delete related records first (foreign key constraints), all in
+        # one transaction so a failure can't leave a half-deleted job
+        with transaction() as tx:
+            tx.execute("DELETE FROM files WHERE job_id = %s", (job_id,))
+            tx.execute("DELETE FROM estimate_items WHERE estimate_id IN (SELECT id FROM estimates WHERE job_id = %s)", (job_id,))
+            tx.execute("DELETE FROM estimates WHERE job_id = %s", (job_id,))
+            tx.execute("DELETE FROM parts WHERE job_id = %s", (job_id,))
+            tx.execute("DELETE FROM deadlines WHERE job_id = %s", (job_id,))
+            tx.execute("DELETE FROM jobs WHERE id = %s", (job_id,))
+        invalidate(job_tag(job_id), user_tag(user_id))
         
         # Clean up files
         job_folder = f"static/uploads/{job_id}"
@@ -1873,10 +1970,10 @@ def set_price(job_id):
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
         
-        execute_query(
+        execute_write(
             "UPDATE jobs SET final_price = %s WHERE id = %s",
             (float(price) if price else None, job_id),
-            fetch=False
+            tags=(job_tag(job_id), user_tag(user_id))
         )
         
         flash("Price updated successfully!", "success")
@@ -1907,10 +2004,10 @@ def update_job_status(job_id):
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
         
-        execute_query(
+        execute_write(
             "UPDATE jobs SET status = %s WHERE id = %s",
             (status, job_id),
-            fetch=False
+            tags=(job_tag(job_id), user_tag(user_id))
         )
         
         flash("Status updated successfully!", "success")
@@ -1933,29 +2030,18 @@ def calendar():
     user_id = session["user_id"]
     
     try:
-        jobs_data = execute_query(
-            "SELECT id, client_name FROM jobs WHERE user_id = %s",
+        # One join; deadlines.job_id is indexed and compared as a uuid
+        deadlines = execute_query(
+            """SELECT d.job_id, d.soft_deadline, d.hard_deadline, j.client_name
+               FROM deadlines d JOIN jobs j ON j.id = d.job_id
+               WHERE j.user_id = %s""",
             (user_id,),
             fetch=True
         )
-        
-        job_ids = [str(j["id"]) for j in jobs_data]
-        job_name_map = {str(j["id"]): j["client_name"] or "Unnamed Job" for j in jobs_data}
-
-        deadlines = []
-        if job_ids:
-            # Use IN clause instead of ANY for better compatibility
-            placeholders = ','.join(['%s'] * len(job_ids))
-            deadlines = execute_query(
-                f"SELECT * FROM deadlines WHERE job_id::text IN ({placeholders})",
-                tuple(job_ids),
-                fetch=True
-            )
 
         events = []
         for d in deadlines:
-            job_id = str(d["job_id"])
-            job_name = job_name_map.get(job_id, "Unnamed Job")
+            job_name = d["client_name"] or "Unnamed Job"
 
             if d.get("soft_deadline"):
                 events.append({
@@ -1981,6 +2067,47 @@ def calendar():
 
 # ===== ESTIMATE ROUTES =====
 
+ESTIMATE_ITEMS_INSERT = (
+    "INSERT INTO estimate_items (estimate_id, item_type, name, description, quantity, unit, unit_price, total_price, created_at) VALUES %s"
+)
+
+def _estimate_item_rows(form, estimate_id):
+    """Parse the estimate form's parallel item_* lists into rows for
+    ESTIMATE_ITEMS_INSERT. Returns (rows, line_total); blank names and
+    unparseable numbers are skipped.
+
+    Items are listed ORDER BY created_at, and every row written in one
+    transaction would get the same NOW(), so each row carries its own
+    timestamp, a microsecond apart, to keep the form's order."""
+    # Read parallel lists — field names match the template exactly
+    item_types = form.getlist('item_type')
+    item_names = form.getlist('item_name')
+    item_quantities = form.getlist('item_quantity')
+    item_units = form.getlist('item_unit')
+    item_prices = form.getlist('item_unit_price')
+    item_descriptions = form.getlist('item_description')
+
+    created_at = datetime.now(timezone.utc)
+    rows = []
+    line_total = 0
+    for i in range(len(item_names)):
+        name = item_names[i].strip() if i < len(item_names) else ''
+        if not name:
+            continue
+        try:
+            itype = item_types[i] if i < len(item_types) else 'material'
+            qty = float(item_quantities[i]) if i < len(item_quantities) and item_quantities[i] else 1
+            unit = item_units[i] if i < len(item_units) and item_units[i] else 'pieces'
+            price = float(item_prices[i]) if i < len(item_prices) and item_prices[i] else 0
+            desc = item_descriptions[i] if i < len(item_descriptions) else ''
+        except ValueError:
+            continue
+        row_total = qty * price
+        line_total += row_total
+        rows.append((estimate_id, itype, name, desc, qty, unit, price, row_total,
+                     created_at + timedelta(microseconds=len(rows))))
+    return rows, line_total
+
 @app.route("/create_detailed_estimate/<job_id>", methods=["GET", "POST"])
 def create_detailed_estimate(job_id):
     if "user_id" not in session:
@@ -1989,10 +2116,7 @@ def create_detailed_estimate(job_id):
     user_id = session["user_id"]
 
     try:
-        job = execute_single(
-            "SELECT * FROM jobs WHERE id = %s AND user_id = %s",
-            (job_id, user_id)
-        )
+        job = _owned_job(job_id, user_id)
 
         if not job:
             flash("Job not found.", "danger")
@@ -2005,47 +2129,15 @@ def create_detailed_estimate(job_id):
             commission = float(request.form.get("commission") or 0)
 
             estimate_id = str(uuid.uuid4())
-            execute_query(
-                "INSERT INTO estimates (id, job_id, name, description, labor_rate, markup_percentage, amount) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                (estimate_id, job_id, estimate_name, description, labor_fee, commission, 0),
-                fetch=False
-            )
-
-            # Read parallel lists — field names match the template exactly
-            item_types = request.form.getlist('item_type')
-            item_names = request.form.getlist('item_name')
-            item_quantities = request.form.getlist('item_quantity')
-            item_units = request.form.getlist('item_unit')
-            item_prices = request.form.getlist('item_unit_price')
-            item_descriptions = request.form.getlist('item_description')
-
-            line_total = 0
-            for i in range(len(item_names)):
-                name = item_names[i].strip() if i < len(item_names) else ''
-                if not name:
-                    continue
-                try:
-                    itype = item_types[i] if i < len(item_types) else 'material'
-                    qty = float(item_quantities[i]) if i < len(item_quantities) and item_quantities[i] else 1
-                    unit = item_units[i] if i < len(item_units) and item_units[i] else 'pieces'
-                    price = float(item_prices[i]) if i < len(item_prices) and item_prices[i] else 0
-                    desc = item_descriptions[i] if i < len(item_descriptions) else ''
-                    row_total = qty * price
-                    line_total += row_total
-                    execute_query(
-                        "INSERT INTO estimate_items (estimate_id, item_type, name, description, quantity, unit, unit_price, total_price) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                        (estimate_id, itype, name, desc, qty, unit, price, row_total),
-                        fetch=False
-                    )
-                except ValueError:
-                    continue
-
+            item_rows, line_total = _estimate_item_rows(request.form, estimate_id)
             final_amount = line_total + labor_fee + commission
-            execute_query(
-                "UPDATE estimates SET amount = %s WHERE id = %s",
-                (final_amount, estimate_id),
-                fetch=False
-            )
+
+            with transaction() as tx:
+                tx.execute(
+                    "INSERT INTO estimates (id, job_id, name, description, labor_rate, markup_percentage, amount) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                    (estimate_id, job_id, estimate_name, description, labor_fee, commission, final_amount)
+                )
+                tx.execute_batch_insert(ESTIMATE_ITEMS_INSERT, item_rows)
 
             flash("Estimate created successfully!", "success")
             return redirect(url_for("view_estimate", estimate_id=estimate_id))
@@ -2053,14 +2145,11 @@ def create_detailed_estimate(job_id):
         # --- GET: build pre-filled line items from parts + accessories ---
 
         # Material line items: group parts by thickness, estimate sheets needed
-        parts = execute_query(
-            "SELECT thickness, width, height FROM parts WHERE job_id = %s",
-            (job_id,), fetch=True
-        )
+        parts = _job_parts(job_id)
         thickness_areas = {}
         for p in parts:
             t = p['thickness'] or '3/4'
-            area = float(p['width']) * float(p['height'])
+            area = float(p['width']) * float(p['height']) * int(p['quantity'])
             thickness_areas[t] = thickness_areas.get(t, 0) + area
 
         sheet_area = 96.0 * 48.0
@@ -2260,43 +2349,16 @@ def edit_estimate(estimate_id):
             estimate_name = request.form.get("estimate_name")
             description = request.form.get("description")
 
-            execute_query(
-                "UPDATE estimates SET name=%s, description=%s, labor_rate=%s, markup_percentage=%s WHERE id=%s",
-                (estimate_name, description, labor_fee, commission, estimate_id),
-                fetch=False
-            )
-            execute_query("DELETE FROM estimate_items WHERE estimate_id = %s", (estimate_id,), fetch=False)
-
-            item_types = request.form.getlist('item_type')
-            item_names = request.form.getlist('item_name')
-            item_quantities = request.form.getlist('item_quantity')
-            item_units = request.form.getlist('item_unit')
-            item_prices = request.form.getlist('item_unit_price')
-            item_descriptions = request.form.getlist('item_description')
-
-            line_total = 0
-            for i in range(len(item_names)):
-                name = item_names[i].strip() if i < len(item_names) else ''
-                if not name:
-                    continue
-                try:
-                    itype = item_types[i] if i < len(item_types) else 'material'
-                    qty = float(item_quantities[i]) if i < len(item_quantities) and item_quantities[i] else 1
-                    unit = item_units[i] if i < len(item_units) and item_units[i] else 'pieces'
-                    price = float(item_prices[i]) if i < len(item_prices) and item_prices[i] else 0
-                    desc = item_descriptions[i] if i < len(item_descriptions) else ''
-                    row_total = qty * price
-                    line_total += row_total
-                    execute_query(
-                        "INSERT INTO estimate_items (estimate_id, item_type, name, description, quantity, unit, unit_price, total_price) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                        (estimate_id, itype, name, desc, qty, unit, price, row_total),
-                        fetch=False
-                    )
-                except ValueError:
-                    continue
-
+            item_rows, line_total = _estimate_item_rows(request.form, estimate_id)
             final_amount = line_total + labor_fee + commission
-            execute_query("UPDATE estimates SET amount=%s WHERE id=%s", (final_amount, estimate_id), fetch=False)
+
+            with transaction() as tx:
+                tx.execute(
+                    "UPDATE estimates SET name=%s, description=%s, labor_rate=%s, markup_percentage=%s, amount=%s WHERE id=%s",
+                    (estimate_name, description, labor_fee, commission, final_amount, estimate_id)
+                )
+                tx.execute("DELETE FROM estimate_items WHERE estimate_id = %s", (estimate_id,))
+                tx.execute_batch_insert(ESTIMATE_ITEMS_INSERT, item_rows)
             flash("Estimate updated.", "success")
             return redirect(url_for("view_estimate", estimate_id=estimate_id))
 
@@ -2424,21 +2486,14 @@ def download_job_pdf(job_id):
     
     try:
         # Get job details
-        job = execute_single(
-            "SELECT * FROM jobs WHERE id = %s AND user_id = %s",
-            (job_id, user_id)
-        )
+        job = _owned_job(job_id, user_id)
         
         if not job:
             flash("Job not found.", "danger")
             return redirect(url_for("jobs"))
         
         # Get parts
-        parts = execute_query(
-            "SELECT * FROM parts WHERE job_id = %s",
-            (job_id,),
-            fetch=True
-        )
+        parts = _job_parts(job_id)
         
         # Create PDF
         buffer = BytesIO()
@@ -2474,7 +2529,7 @@ def download_job_pdf(job_id):
                 p.showPage()
                 y_position = height - 50
             
-            p.drawString(50, y_position, f"{i}. {part['width']}\" x {part['height']}\" x {part.get('thickness', 'N/A')} - {part.get('material', 'N/A')}")
+            p.drawString(50, y_position, f"{i}. {part['quantity']} x {part['width']}\" x {part['height']}\" x {part.get('thickness', 'N/A')} - {part.get('material', 'N/A')}")
             y_position -= 15
         
         p.save()
@@ -2502,14 +2557,28 @@ def view_stocks():
     
     user_id = session["user_id"]
     
+    size = pagination.page_size(request.args.get("per_page"))
+    
     try:
-        stocks = execute_query(
-            "SELECT * FROM stocks WHERE user_id = %s ORDER BY category, name",
-            (user_id,),
-            fetch=True
-        )
+        keys = [("category_key", "ASC"), ("name", "ASC"), ("id", "ASC")]
+        cursor = pagination.decode_cursor(request.args.get("after"), len(keys))
+        page_sql, page_params = pagination.page_query(
+            "SELECT *, COALESCE(category, '') AS category_key FROM stocks WHERE user_id = %s", keys, cursor, size
+        )
+        data = execute_reads({
+            "stocks": (page_sql, (user_id, *page_params)),
+            "estimate": (pagination.estimate_sql("SELECT 1 FROM stocks WHERE user_id = %s"), (user_id,), "one"),
+        })
+        stocks, next_cursor = pagination.split_page(data["stocks"], size, keys)
+        total, total_exact = pagination.total(data["estimate"], stocks, cursor is None, next_cursor)
+        next_url = url_for("view_stocks", per_page=request.args.get("per_page"),
+                           after=next_cursor) if next_cursor else None
         
-        return render_template("stocks.html", stocks=stocks)
+        # Stock is listed under category headings; a page that continues
+        # the previous page's last category (the cursor's first value) must
+        # not repeat its heading when "Load more" appends it
+        return render_template("stocks.html", stocks=stocks, total=total, total_exact=total_exact,
+                               next_url=next_url, prev_category=cursor[0] if cursor else None)
         
     except Exception as e:
         capture_exception(e)
@@ -2533,8 +2602,9 @@ def add_stock():
         color = request.form.get("color")
         
         execute_query(
-            "INSERT INTO stocks (user_id, name, category, quantity, unit, code, color) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-            (user_id, name, category, int(quantity), unit, code, color),
+            "INSERT INTO stocks (user_id, name, category, quantity, unit, code, color, thickness, material) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, stock_thickness(%s, %s), stock_material(%s))",
+            (user_id, name, category, int(quantity), unit, code, color, name, unit, name),
             fetch=False
         )
         
@@ -2693,50 +2763,39 @@ def export_data():
 
     user_id = session["user_id"]
 
-    def write_csv(zf, filename, rows):
-        if not rows:
-            return
-        buf = StringIO()
-        writer = csv.DictWriter(buf, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
-        zf.writestr(filename, buf.getvalue())
+    def write_csv(zf, filename, query):
+        # Rows stream from a server-side cursor straight into the zip entry,
+        # so a large tenant's export never sits in memory all at once
+        with stream_query(query, (user_id,), tuples=True) as rows:
+            it = iter(rows)
+            first = next(it, None)
+            if first is None:
+                return
+            with zf.open(filename, "w") as raw, TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(rows.columns)
+                writer.writerow(first)
+                writer.writerows(it)
+
+    user_jobs = "SELECT id FROM jobs WHERE user_id = %s"
 
     try:
-        jobs = execute_query("SELECT * FROM jobs WHERE user_id = %s ORDER BY created_at", (user_id,), fetch=True)
-        job_ids = [str(j["id"]) for j in jobs]
+        job_ids = [str(j["id"]) for j in execute_query(user_jobs, (user_id,), fetch=True)]
 
-        zip_buffer = BytesIO()
+        # Spills to a temp file once the archive outgrows memory
+        zip_buffer = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
         with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-            write_csv(zf, "jobs.csv", jobs)
+            write_csv(zf, "jobs.csv", "SELECT * FROM jobs WHERE user_id = %s ORDER BY created_at")
 
             if job_ids:
-                placeholders = ','.join(['%s'] * len(job_ids))
-                params = tuple(job_ids)
-
-                parts = execute_query(f"SELECT * FROM parts WHERE job_id::text IN ({placeholders})", params, fetch=True)
-                write_csv(zf, "parts.csv", parts)
-
-                estimates = execute_query(f"SELECT * FROM estimates WHERE job_id::text IN ({placeholders})", params, fetch=True)
-                write_csv(zf, "estimates.csv", estimates)
-
-                estimate_ids = [str(e["id"]) for e in estimates]
-                if estimate_ids:
-                    e_placeholders = ','.join(['%s'] * len(estimate_ids))
-                    estimate_items = execute_query(
-                        f"SELECT * FROM estimate_items WHERE estimate_id::text IN ({e_placeholders})",
-                        tuple(estimate_ids), fetch=True
-                    )
-                    write_csv(zf, "estimate_items.csv", estimate_items)
-
-                payments = execute_query(f"SELECT * FROM payments WHERE job_id::text IN ({placeholders})", params, fetch=True)
-                write_csv(zf, "payments.csv", payments)
-
-                accessories = execute_query(f"SELECT * FROM job_accessories WHERE job_id::text IN ({placeholders})", params, fetch=True)
-                write_csv(zf, "accessories.csv", accessories)
-
-                deadlines = execute_query(f"SELECT * FROM deadlines WHERE job_id::text IN ({placeholders})", params, fetch=True)
-                write_csv(zf, "deadlines.csv", deadlines)
+                write_csv(zf, "parts.csv", f"SELECT * FROM parts WHERE job_id IN ({user_jobs})")
+                write_csv(zf, "estimates.csv", f"SELECT * FROM estimates WHERE job_id IN ({user_jobs})")
+                write_csv(zf, "estimate_items.csv",
+                          f"SELECT * FROM estimate_items WHERE estimate_id IN "
+                          f"(SELECT id FROM estimates WHERE job_id IN ({user_jobs}))")
+                write_csv(zf, "payments.csv", f"SELECT * FROM payments WHERE job_id IN ({user_jobs})")
+                write_csv(zf, "accessories.csv", f"SELECT * FROM job_accessories WHERE job_id IN ({user_jobs})")
+                write_csv(zf, "deadlines.csv", f"SELECT * FROM deadlines WHERE job_id IN ({user_jobs})")
 
                 # Uploaded photos/sketches live only on disk (not in the database) and
                 # aren't recoverable if the server's filesystem is ever wiped, so bundle
@@ -2773,8 +2832,31 @@ def dashboard():
 def robots_txt():
     return app.send_static_file("robots.txt")
 
+# ===== ADMIN =====
+
+# Comma-separated account emails allowed to see the admin pages.
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+@app.route("/admin/db-stats")
+def admin_db_stats():
+    user = current_user()
+    if not user or (user.get("email") or "").lower() not in ADMIN_EMAILS:
+        return "Not found", 404
+    return render_template(
+        "admin_db_stats.html",
+        enabled=db_stats.ENABLED,
+        slow_ms=db_stats.SLOW_MS,
+        n1_threshold=db_stats.N_PLUS_ONE_THRESHOLD,
+        slow_queries=db_stats.slow_queries(),
+        prepare=prepare_stats(),
+        pool=pool_stats(),
+        query_cache=query_cache_stats(),
+    )
+
 # ===== RUN APPLICATION =====
 
 if __name__ == "__main__":
+    # No-op unless NEON_KEEPWARM=1; under gunicorn, gunicorn.conf.py starts it
+    start_keepwarm()
     port = int(os.environ.get("PORT", 10000))
     app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
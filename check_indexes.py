@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN check for the hot lookup paths.
+Seeds a batch of large tenants, ANALYZEs, and asserts that each route's
+query is planned as a scan of the index built for it (migrations/0003,
+0005, 0008-0012). The listing and stock-check queries are the ones the
+routes run, built by queries.py and pagination.py.
+Everything runs in one transaction that is rolled back at the end, but the
+seed is big and leaves dead rows and table statistics behind: point
+NEON_MIGRATE_CONNECTION_STRING (or NEON_CONNECTION_STRING) at a Neon
+branch, not production.
+
+    python check_indexes.py [--tenants 20] [--jobs 2000] [--parts 10]
+"""
+
+import argparse
+import sys
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+import pagination
+import queries
+from migrate import MIGRATE_CONNECTION_STRING
+
+
+def _page(listing, cursor=None):
+    """A queries.* listing as its route runs it: page_query's keyset seek
+    (past `cursor`, the sort values of a row) and LIMIT."""
+    (inner, params, keys), _ = listing
+    if cursor is not None:
+        cursor = pagination.decode_cursor(pagination.encode_cursor(cursor), len(keys))
+    sql, page_params = pagination.page_query(inner, keys, cursor, pagination.PAGE_SIZE)
+    return sql, (*params, *page_params)
+
+
+# (label, expected index or indexes, (query, params) built from the sample
+# row). The listings and lookups come from queries.py, the SQL the routes run.
+CHECKS = [
+    ("jobs list", "idx_jobs_user_created_id",
+     lambda s: _page(queries.job_list(s["user_id"]))),
+    ("jobs list, next page", "idx_jobs_user_created_id",
+     lambda s: _page(queries.job_list(s["user_id"]), [s["created_at"], s["job_id"]])),
+    ("jobs by status", "idx_jobs_user_status_created_id",
+     lambda s: _page(queries.job_list(s["user_id"], status="done"), [s["created_at"], s["job_id"]])),
+    ("jobs by client", "idx_jobs_client_created",
+     lambda s: _page(queries.job_list(s["user_id"], client_id=s["client_id"]))),
+    ("job search", "idx_jobs_search_trgm",
+     lambda s: _page(queries.job_list(s["user_id"], q=s["search_term"]))),
+    ("clients list", ("idx_clients_user_name_key", "idx_jobs_client_created"),
+     lambda s: _page(queries.client_list(s["user_id"]))),
+    ("client jobs", "idx_jobs_client_created",
+     lambda s: queries.client_jobs([s["client_id"]])),
+    ("stock check", "idx_stocks_user_thickness",
+     lambda s: queries.material_stock(s["user_id"], s["job_id"])),
+    ("job parts", "idx_parts_job_created",
+     lambda s: ("SELECT * FROM parts WHERE job_id = %s ORDER BY created_at",
+                (s["job_id"],))),
+    ("job files", "idx_files_job_uploaded",
+     lambda s: ("SELECT * FROM files WHERE job_id = %s ORDER BY uploaded_at",
+                (s["job_id"],))),
+    ("cut sheets", "idx_cut_sheets_job_sheet",
+     lambda s: ("SELECT * FROM cut_sheets WHERE job_id = %s ORDER BY sheet_number",
+                (s["job_id"],))),
+    ("estimates", "idx_estimates_job_created",
+     lambda s: ("SELECT * FROM estimates WHERE job_id = %s ORDER BY created_at DESC",
+                (s["job_id"],))),
+    ("estimate items", "idx_estimate_items_estimate_type_created",
+     lambda s: ("SELECT * FROM estimate_items WHERE estimate_id = %s ORDER BY item_type, created_at",
+                (s["estimate_id"],))),
+    ("payments", "idx_payments_job_paid",
+     lambda s: ("SELECT * FROM payments WHERE job_id = %s ORDER BY paid_at DESC",
+                (s["job_id"],))),
+    ("job hours", "idx_job_hours_job_work_date",
+     lambda s: ("SELECT * FROM job_hours WHERE job_id = %s ORDER BY work_date DESC NULLS LAST, created_at DESC",
+                (s["job_id"],))),
+    ("accessories", "idx_job_accessories_job_created",
+     lambda s: ("SELECT * FROM job_accessories WHERE job_id = %s ORDER BY created_at",
+                (s["job_id"],))),
+    ("deadlines", "idx_deadlines_user_hard_deadline",
+     lambda s: ("SELECT job_id, hard_deadline FROM deadlines WHERE user_id = %s AND hard_deadline IS NOT NULL ORDER BY hard_deadline",
+                (s["user_id"],))),
+    ("shared estimate", "idx_estimates_share_token",
+     lambda s: ("SELECT * FROM estimates WHERE share_token = %s",
+                (s["share_token"],))),
+    ("password reset", "idx_users_reset_token_hash",
+     lambda s: ("SELECT id, reset_token_expires FROM users WHERE reset_token_hash = %s",
+                (s["reset_token_hash"],))),
+]
+
+SEED = [
+    """INSERT INTO users (email, password_hash, reset_token_hash)
+       SELECT 'index-check-' || t || '@example.invalid', 'x',
+              CASE WHEN t = 1 THEN md5('reset-' || t) END
+       FROM generate_series(1, %(tenants)s) t""",
+    """INSERT INTO jobs (user_id, client_name, status, final_price, created_at)
+       SELECT u.id, 'Client ' || j,
+              (ARRAY['draft', 'quoted', 'deposit_paid', 'in_progress', 'done', 'cancelled'])[1 + j %% 6],
+              j %% 900, NOW() - j * INTERVAL '1 hour'
+       FROM users u, generate_series(1, %(jobs)s) j
+       WHERE u.email LIKE 'index-check-%%'""",
+    """CREATE TEMP TABLE seeded_jobs ON COMMIT DROP AS
+       SELECT j.id, j.user_id FROM jobs j JOIN users u ON u.id = j.user_id
+       WHERE u.email LIKE 'index-check-%%'""",
+    """INSERT INTO clients (user_id, name)
+       SELECT DISTINCT user_id, client_name FROM jobs WHERE user_id IN (SELECT user_id FROM seeded_jobs)""",
+    """UPDATE jobs j SET client_id = c.id FROM clients c
+       WHERE c.user_id = j.user_id AND c.name_key = lower(trim(j.client_name))
+         AND j.id IN (SELECT id FROM seeded_jobs)""",
+    """INSERT INTO stocks (user_id, name, quantity, unit, thickness, material)
+       SELECT u.id, stock_name, 5, 'sheets', stock_thickness(stock_name, 'sheets'), stock_material(stock_name)
+       FROM users u, generate_series(1, 200) n,
+            LATERAL (SELECT (ARRAY['3/4', '1/2', '1/4'])[1 + n %% 3] || ' Panel ' || n AS stock_name) names
+       WHERE u.email LIKE 'index-check-%%'""",
+    """INSERT INTO parts (job_id, width, height, thickness, material)
+       SELECT s.id, 10 + p, 20 + p, '3/4', '3/4' FROM seeded_jobs s, generate_series(1, %(parts)s) p""",
+    """INSERT INTO files (job_id, user_id, filename, storage_path)
+       SELECT id, user_id, 'plan.pdf', 'uploads/plan.pdf' FROM seeded_jobs""",
+    """INSERT INTO cut_sheets (job_id, src, sheet_number, layout)
+       SELECT s.id, 'sheets/x.png', n, jsonb_build_object('label_prefix', (ARRAY['3/4"', '1/2"'])[n])
+       FROM seeded_jobs s, generate_series(1, 2) n""",
+    """INSERT INTO estimates (job_id, amount, share_token)
+       SELECT id, 100, CASE WHEN abs(hashtext(id::text)) %% 100 = 0 THEN md5(id::text) END FROM seeded_jobs""",
+    """UPDATE estimates SET share_token = md5(id::text)
+       WHERE id = (SELECT e.id FROM estimates e JOIN seeded_jobs s ON s.id = e.job_id LIMIT 1)""",
+    """INSERT INTO estimate_items (estimate_id, item_type, name, quantity, unit_price, total_price)
+       SELECT e.id, (ARRAY['material', 'hardware', 'labor'])[1 + n %% 3], 'Item', 1, 10, 10
+       FROM estimates e JOIN seeded_jobs s ON s.id = e.job_id, generate_series(1, 5) n""",
+    """INSERT INTO payments (job_id, user_id, amount) SELECT id, user_id, 50 FROM seeded_jobs""",
+    """INSERT INTO job_hours (job_id, user_id, hours, work_date) SELECT id, user_id, 4, CURRENT_DATE FROM seeded_jobs""",
+    """INSERT INTO job_accessories (job_id, name) SELECT id, 'Hinge' FROM seeded_jobs""",
+    """INSERT INTO deadlines (job_id, user_id, hard_deadline)
+       SELECT id, user_id, CURRENT_DATE + (random() * 60)::int FROM seeded_jobs""",
+]
+
+SAMPLE = """
+    SELECT s.id AS job_id, s.user_id, e.id AS estimate_id,
+           (SELECT client_id FROM jobs WHERE id = s.id) AS client_id,
+           (SELECT created_at FROM jobs WHERE id = s.id) AS created_at,
+           -- 'Client 1000' style: matches one job per tenant, not a prefix of many
+           (SELECT client_name FROM jobs WHERE id IN (SELECT id FROM seeded_jobs)
+              ORDER BY length(client_name) DESC, client_name LIMIT 1) AS search_term,
+           (SELECT share_token FROM estimates WHERE share_token IS NOT NULL
+              AND job_id IN (SELECT id FROM seeded_jobs) LIMIT 1) AS share_token,
+           (SELECT reset_token_hash FROM users WHERE email = 'index-check-1@example.invalid') AS reset_token_hash
+    FROM seeded_jobs s JOIN estimates e ON e.job_id = s.id
+    LIMIT 1
+"""
+
+TABLES = ["users", "clients", "jobs", "parts", "files", "cut_sheets", "estimates", "estimate_items",
+          "payments", "job_hours", "job_accessories", "deadlines", "stocks"]
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def check_plan(cursor, query, params, expected):
+    """Returns (ok, summary) for one query's EXPLAIN plan: ok when it scans
+    the expected index, or every one of a tuple of them."""
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    plan = cursor.fetchone()["QUERY PLAN"][0]["Plan"]
+    nodes = list(_plan_nodes(plan))
+    used = {n.get("Index Name") for n in nodes}
+    summary = " > ".join(
+        n["Node Type"] + (f" ({n['Index Name']})" if n.get("Index Name") else "") for n in nodes
+    )
+    expected = (expected,) if isinstance(expected, str) else expected
+    return all(index in used for index in expected), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert the hot-path queries use their indexes")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--jobs", type=int, default=2000, help="jobs per tenant")
+    parser.add_argument("--parts", type=int, default=10, help="parts per job")
+    args = parser.parse_args()
+
+    if not MIGRATE_CONNECTION_STRING:
+        print("❌ Missing Neon connection string")
+        return 1
+
+    conn = psycopg2.connect(MIGRATE_CONNECTION_STRING)
+    failures = 0
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        print(f"🌱 Seeding {args.tenants} tenants x {args.jobs} jobs x {args.parts} parts...")
+        for statement in SEED:
+            cursor.execute(statement, vars(args))
+        for table in TABLES:
+            cursor.execute(f"ANALYZE {table}")
+        cursor.execute(SAMPLE)
+        sample = cursor.fetchone()
+
+        for label, index, build in CHECKS:
+            ok, summary = check_plan(cursor, *build(sample), index)
+            print(f"{'✅' if ok else '❌'} {label}: {summary}")
+            if not ok:
+                failures += 1
+                print(f"   expected a scan of {index if isinstance(index, str) else ' and '.join(index)}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    if failures:
+        print(f"❌ {failures} of {len(CHECKS)} queries did not use their index")
+        return 1
+    print(f"🎉 All {len(CHECKS)} queries use their index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
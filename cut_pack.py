@@ -0,0 +1,209 @@
+"""Builds the printable Cut Pack PDF: every sheet of a job's persisted cut
+plan drawn as vector graphics (one sheet per page, part numbers and
+dimensions on each piece), followed by a checklist table to tick off parts
+at the saw. Shares the Client Package branding."""
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import (
+    SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Flowable,
+    HRFlowable, PageBreak
+)
+
+from client_package import (
+    MARGIN, HEADER_H, CONTENT_W, BRAND_DARK, BRAND_ACCENT, BORDER, ROW_ALT,
+    TEXT_DARK, MUTED, _styles, _make_canvas, _draw_header_band,
+)
+
+PANEL_FILL = colors.HexColor("#e9e4dc")
+PART_FILL = colors.HexColor("#cfe3f0")
+PART_STROKE = colors.HexColor("#1f5f8b")
+GRID = colors.HexColor("#bdb5aa")
+
+# Leaves room for the page header, sheet heading and footer on letter paper.
+MAX_DIAGRAM_H = 430
+
+
+def _fmt_in(value):
+    return f'{float(value):g}"'
+
+
+class SheetDiagram(Flowable):
+    """Draws one sheet layout (panel, 12" grid, numbered parts) scaled to
+    fit the available width."""
+
+    def __init__(self, layout, max_w, max_h=MAX_DIAGRAM_H):
+        Flowable.__init__(self)
+        self.layout = layout
+        panel_w, panel_h = (float(v) for v in layout["panel_size"])
+        self.panel_w, self.panel_h = panel_w, panel_h
+        self.scale = min(max_w / panel_w, max_h / panel_h)
+        self.width = panel_w * self.scale
+        self.height = panel_h * self.scale
+
+    def draw(self):
+        c = self.canv
+        s = self.scale
+        top = self.height
+
+        c.setStrokeColor(TEXT_DARK)
+        c.setFillColor(PANEL_FILL)
+        c.setLineWidth(1)
+        c.rect(0, 0, self.width, self.height, fill=1, stroke=1)
+
+        c.setStrokeColor(GRID)
+        c.setLineWidth(0.3)
+        c.setDash(2, 2)
+        for x in range(12, int(self.panel_w), 12):
+            c.line(x * s, 0, x * s, self.height)
+        for y in range(12, int(self.panel_h), 12):
+            c.line(0, top - y * s, self.width, top - y * s)
+        c.setDash()
+
+        # Layout coordinates have y growing downward from the panel's top
+        # edge (matches the PNG renders); PDF y grows upward.
+        c.setLineWidth(0.8)
+        for cut in self.layout["cut_plan"]:
+            x, y = (float(v) for v in cut["position"])
+            w, h = float(cut["width"]), float(cut["height"])
+            px, py, pw, ph = x * s, top - (y + h) * s, w * s, h * s
+            c.setStrokeColor(PART_STROKE)
+            c.setFillColor(PART_FILL)
+            c.rect(px, py, pw, ph, fill=1, stroke=1)
+
+            label = f"#{cut['part_number']}"
+            dims = f"{_fmt_in(w)} x {_fmt_in(h)}"
+            font_size = 9 if min(pw, ph) >= 28 else 6
+            c.setFillColor(TEXT_DARK)
+            c.setFont("Helvetica-Bold", font_size)
+            cx, cy = px + pw / 2, py + ph / 2
+            if ph >= font_size * 2.6 and c.stringWidth(dims, "Helvetica", font_size - 1) <= pw - 4:
+                c.drawCentredString(cx, cy + 1, label)
+                c.setFont("Helvetica", font_size - 1)
+                c.setFillColor(MUTED)
+                c.drawCentredString(cx, cy - font_size, dims)
+            else:
+                c.drawCentredString(cx, cy - font_size / 3, label)
+
+
+class _CheckboxTable(Table):
+    """Table that draws an empty tick box in column 0 of every body row —
+    drawn as a square rather than a glyph so it prints regardless of font
+    coverage. Row 0 is the (repeated) header on every split page."""
+
+    def draw(self):
+        Table.draw(self)
+        c = self.canv
+        box = 9
+        x = (self._colWidths[0] - box) / 2
+        y_top = self._height
+        c.setStrokeColor(TEXT_DARK)
+        c.setLineWidth(0.8)
+        for i, row_h in enumerate(self._rowHeights):
+            y_top -= row_h
+            if i == 0:
+                continue
+            c.rect(x, y_top + (row_h - box) / 2, box, box, fill=0, stroke=1)
+
+
+def _checklist_table(layouts, styles):
+    header = [
+        Paragraph("", styles["th"]),
+        Paragraph("Sheet", styles["th"]),
+        Paragraph("Thickness", styles["th"]),
+        Paragraph("Part #", styles["th"]),
+        Paragraph("Width", styles["th_right"]),
+        Paragraph("Height", styles["th_right"]),
+    ]
+    data = [header]
+    for layout in layouts:
+        thickness = layout.get("label_prefix") or ""
+        for cut in sorted(layout["cut_plan"], key=lambda c: c["part_number"]):
+            data.append([
+                "",
+                Paragraph(f"#{layout['sheet_number']}", styles["cell"]),
+                Paragraph(thickness, styles["cell"]),
+                Paragraph(f"#{cut['part_number']}", styles["cell"]),
+                Paragraph(_fmt_in(cut["width"]), styles["cell_right"]),
+                Paragraph(_fmt_in(cut["height"]), styles["cell_right"]),
+            ])
+
+    col_widths = [CONTENT_W * 0.08, CONTENT_W * 0.14, CONTENT_W * 0.18,
+                  CONTENT_W * 0.16, CONTENT_W * 0.22, CONTENT_W * 0.22]
+    t = _CheckboxTable(data, colWidths=col_widths, repeatRows=1)
+    style = [
+        ("BACKGROUND", (0, 0), (-1, 0), BRAND_DARK),
+        ("TOPPADDING", (0, 0), (-1, -1), 5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+        ("LEFTPADDING", (0, 0), (-1, -1), 8),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+        ("LINEBELOW", (0, 0), (-1, -1), 0.5, BORDER),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]
+    for i in range(1, len(data)):
+        if i % 2 == 0:
+            style.append(("BACKGROUND", (0, i), (-1, i), ROW_ALT))
+    t.setStyle(TableStyle(style))
+    return t
+
+
+def build_cut_pack_pdf(job, layouts):
+    """Returns a BytesIO PDF with one vector page per sheet layout (as
+    persisted on cut_sheets.layout) and a closing checklist table."""
+    styles = _styles("en")
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=letter,
+        leftMargin=MARGIN, rightMargin=MARGIN,
+        topMargin=HEADER_H + 30, bottomMargin=55,
+        title=f"Cut Pack — {job.get('client_name') or 'Job'}",
+    )
+
+    def _on_page(canvas_obj, doc_obj):
+        _draw_header_band(canvas_obj, doc_obj, "en")
+
+    client_name = escape(job.get("client_name") or "Client")
+    part_count = sum(len(layout["cut_plan"]) for layout in layouts)
+    heading = ParagraphStyle("sheet_heading", fontName="Helvetica-Bold", fontSize=16,
+                             textColor=BRAND_DARK, leading=20)
+
+    story = [
+        Paragraph(f"Cut Pack — {client_name}", styles["title"]),
+        Spacer(1, 4),
+        Paragraph(f"{len(layouts)} sheet(s) · {part_count} part(s)", styles["subtitle"]),
+        Spacer(1, 12),
+        HRFlowable(width=CONTENT_W, color=BORDER, thickness=1),
+        Spacer(1, 16),
+    ]
+
+    for i, layout in enumerate(layouts):
+        if i:
+            story.append(PageBreak())
+        panel_w, panel_h = (float(v) for v in layout["panel_size"])
+        thickness = layout.get("label_prefix")
+        title = f"Sheet #{layout['sheet_number']}"
+        if thickness:
+            title += f" — {thickness}"
+        story.append(Paragraph(title, heading))
+        story.append(Paragraph(
+            f"{_fmt_in(panel_w)} x {_fmt_in(panel_h)} panel · {len(layout['cut_plan'])} part(s)",
+            styles["subtitle"]))
+        story.append(Spacer(1, 4))
+        story.append(HRFlowable(width=60, color=BRAND_ACCENT, thickness=2))
+        story.append(Spacer(1, 14))
+        story.append(SheetDiagram(layout, CONTENT_W))
+
+    story.append(PageBreak())
+    story.append(Paragraph("Cut Checklist", styles["section"]))
+    story.append(Spacer(1, 4))
+    story.append(HRFlowable(width=60, color=BRAND_ACCENT, thickness=2))
+    story.append(Spacer(1, 14))
+    story.append(_checklist_table(layouts, styles))
+
+    doc.build(story, onFirstPage=_on_page, onLaterPages=_on_page, canvasmaker=_make_canvas("en"))
+    buffer.seek(0)
+    return buffer
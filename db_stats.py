@@ -0,0 +1,93 @@
+"""Per-request database instrumentation. Off unless DB_STATS=1: when off,
+nothing is registered and neon_client's query path only checks a None hook.
+
+When on, every statement run through neon_client is counted and timed
+against the current Flask request. Each response gets a Server-Timing
+header (visible in the browser's network panel), a log line is printed when
+a request repeats the same statement DB_STATS_N1_THRESHOLD+ times (the
+N+1 pattern), and statements slower than DB_STATS_SLOW_MS land in a ring
+buffer shown at /admin/db-stats."""
+import os
+import re
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+
+import neon_client
+
+ENABLED = os.getenv("DB_STATS") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_STATS_N1_THRESHOLD", "10"))
+SLOW_MS = float(os.getenv("DB_STATS_SLOW_MS", "100"))
+SLOW_LOG_SIZE = int(os.getenv("DB_STATS_SLOW_LOG_SIZE", "50"))
+
+# deque.append is atomic, so worker threads can share it without a lock
+_slow_log = deque(maxlen=SLOW_LOG_SIZE)
+
+_WHITESPACE = re.compile(r"\s+")
+# IN (%s, %s, ...) lists built per call collapse to one shape
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """Statement shape with literals and placeholder lists folded, so the
+    same query issued with different values counts as one."""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _PLACEHOLDER_LIST.sub("%s, ...", sql)
+    return _LITERAL.sub("?", sql)
+
+
+def _record(sql, seconds):
+    fp = fingerprint(sql)
+    in_request = has_request_context() and "db_stats" in g
+    if in_request:
+        stats = g.db_stats
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["fingerprints"][fp] += 1
+    ms = seconds * 1000
+    if ms >= SLOW_MS:
+        _slow_log.append({
+            "ms": round(ms, 1),
+            "sql": fp,
+            "path": f"{request.method} {request.path}" if in_request else "(startup/background)",
+            "at": datetime.now(timezone.utc),
+        })
+
+
+def _start_request():
+    g.db_stats = {"count": 0, "seconds": 0.0, "fingerprints": Counter(), "started": time.perf_counter()}
+
+
+def _finish_request(response):
+    stats = g.pop("db_stats", None)
+    if stats is None:
+        return response
+    db_ms = stats["seconds"] * 1000
+    total_ms = (time.perf_counter() - stats["started"]) * 1000
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_ms:.1f};desc="{stats["count"]} queries", app;dur={total_ms:.1f}'
+    )
+    repeated = [(fp, n) for fp, n in stats["fingerprints"].most_common() if n >= N_PLUS_ONE_THRESHOLD]
+    for fp, n in repeated:
+        print(f"⚠️ N+1? {request.method} {request.path} ran {n}x: {fp[:200]}")
+    if stats["count"]:
+        print(f"🗄️ {request.method} {request.path} {response.status_code}: "
+              f"{stats['count']} queries, {db_ms:.1f}ms db / {total_ms:.1f}ms total")
+    return response
+
+
+def slow_queries():
+    """Slow-statement ring buffer, slowest first."""
+    return sorted(_slow_log, key=lambda entry: entry["ms"], reverse=True)
+
+
+def init_app(app):
+    """Hook instrumentation into `app` if DB_STATS=1; otherwise a no-op."""
+    if not ENABLED:
+        return
+    neon_client.set_query_recorder(_record)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,17 @@
+# Loaded automatically by gunicorn from the working directory.
+
+
+def pre_fork(server, worker):
+    # Runs in the master. Hand the Neon keep-warm thread to one worker at a
+    # time: the first one forked, and a replacement whenever that one exits
+    # (dead workers are reaped from server.WORKERS before the respawn).
+    if not any(getattr(w, "keepwarm", False) for w in server.WORKERS.values()):
+        worker.keepwarm = True
+
+
+def post_fork(server, worker):
+    # Runs in the new worker. Threads started in a --preload master don't
+    # survive the fork, so the keep-warm thread has to start here.
+    if getattr(worker, "keepwarm", False):
+        from neon_client import start_keepwarm
+        start_keepwarm()
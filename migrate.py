@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Applies the SQL files in migrations/ in order, each exactly once, and
+records them in schema_migrations. Run it as the release step, before new
+code starts serving (Procfile `release:`, render.yaml preDeployCommand):
+
+    python migrate.py            apply pending migrations
+    python migrate.py --status   list applied and pending migrations
+
+Files are named NNNN_description.sql; NNNN is the schema version. Each file
+runs in its own transaction. A file whose first line is
+`-- migrate: no-transaction` runs statement by statement in autocommit
+instead, which CREATE INDEX CONCURRENTLY needs; keep such files to plain
+idempotent statements (no function bodies), since a failure part-way
+leaves the earlier statements applied. An interrupted CREATE INDEX
+CONCURRENTLY also leaves an INVALID index behind that IF NOT EXISTS will
+skip, so drop it before re-running.
+
+The app itself only calls check_schema() at startup: one query comparing
+the database's version with the newest file here."""
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+import psycopg2
+
+from neon_client import NEON_CONNECTION_STRING, execute_single
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Migrations take an advisory lock for the whole run, which a transaction-
+# mode pooler (Neon's "-pooler" host) can't hold; point this at the direct
+# endpoint when the app uses the pooled one.
+MIGRATE_CONNECTION_STRING = os.getenv("NEON_MIGRATE_CONNECTION_STRING") or NEON_CONNECTION_STRING
+LOCK_ID = 4_120_041  # arbitrary, shared by every migrate.py run
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+_NO_TRANSACTION = "-- migrate: no-transaction"
+_STATEMENT_END = re.compile(r";\s*(?:--[^\n]*)?\n")
+
+
+def migration_files():
+    """[(version, name, path)] for every migration file, in version order."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise Exception(f"Duplicate migration version in {MIGRATIONS_DIR}")
+    return found
+
+
+def latest_version():
+    files = migration_files()
+    return files[-1][0] if files else 0
+
+
+def check_schema():
+    """Compare the database's schema version with the code's, with a single
+    query. Prints a warning and returns False when they differ."""
+    expected = latest_version()
+    try:
+        row = execute_single("SELECT max(version) AS version FROM schema_migrations")
+    except Exception as e:
+        print(f"⚠️ Could not read schema version ({e}); run `python migrate.py`")
+        return False
+    current = (row or {}).get("version") or 0
+    if current != expected:
+        print(f"⚠️ Database schema is at version {current}, code expects {expected}; run `python migrate.py`")
+        return False
+    print(f"✅ Database schema at version {current}")
+    return True
+
+
+def _checksum(sql):
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def _statements(sql):
+    chunks = _STATEMENT_END.split(sql + "\n")
+    statements = []
+    for chunk in chunks:
+        code = "\n".join(line for line in chunk.splitlines() if not line.strip().startswith("--")).strip()
+        if code:
+            statements.append(code)
+    return statements
+
+
+def _ensure_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum VARCHAR(64) NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        """)
+
+
+def _applied(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+        return {row[0]: row for row in cursor.fetchall()}
+
+
+def _apply(conn, version, name, sql):
+    record = (
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+        (version, name, _checksum(sql)),
+    )
+    if sql.lstrip().startswith(_NO_TRANSACTION):
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in _statements(sql):
+                    cursor.execute(statement)
+                cursor.execute(*record)
+        finally:
+            conn.autocommit = False
+        return
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+            cursor.execute(*record)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def status(conn):
+    applied = _applied(conn)
+    for version, name, path in migration_files():
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+        row = applied.get(version)
+        if row is None:
+            print(f"   pending  {version:04d} {name}")
+        elif row[2] != _checksum(sql):
+            print(f"⚠️ changed  {version:04d} {name} (applied {row[3]:%Y-%m-%d %H:%M}, file edited since)")
+        else:
+            print(f"✅ applied  {version:04d} {name} ({row[3]:%Y-%m-%d %H:%M})")
+
+
+def migrate(conn):
+    """Apply every pending migration in order. Returns how many ran."""
+    with conn.cursor() as cursor:
+        # Two releases racing (or a retried deploy) must not both apply a file
+        cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_ID,))
+    conn.commit()
+    try:
+        applied = _applied(conn)
+        conn.commit()
+        ran = 0
+        for version, name, path in migration_files():
+            if version in applied:
+                continue
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            print(f"🔄 Applying {version:04d} {name}...")
+            _apply(conn, version, name, sql)
+            ran += 1
+        return ran
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_ID,))
+        conn.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    if not MIGRATE_CONNECTION_STRING:
+        print("❌ Missing Neon connection string")
+        return 1
+    conn = psycopg2.connect(MIGRATE_CONNECTION_STRING)
+    try:
+        _ensure_table(conn)
+        conn.commit()
+        if args.status:
+            status(conn)
+            return 0
+        ran = migrate(conn)
+        print(f"✅ Schema at version {latest_version()} ({ran} migration(s) applied)")
+        return 0
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
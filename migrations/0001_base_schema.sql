@@ -0,0 +1,148 @@
+-- Base schema (schema.sql), written so it is a no-op on databases that were
+-- created before migrations existed.
+
+CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+
+CREATE TABLE IF NOT EXISTS users (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    email VARCHAR(255) UNIQUE NOT NULL,
+    username VARCHAR(255),
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    client_name VARCHAR(255),
+    final_price DECIMAL(10,2),
+    status VARCHAR(50) DEFAULT 'draft',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS parts (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    width DECIMAL(10,2) NOT NULL,
+    height DECIMAL(10,2) NOT NULL,
+    thickness VARCHAR(50),
+    material VARCHAR(100),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS deadlines (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    soft_deadline DATE,
+    hard_deadline DATE,
+    job_name VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS estimates (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    amount DECIMAL(10,2) NOT NULL,
+    name VARCHAR(255),
+    description TEXT,
+    labor_rate DECIMAL(6,2),
+    markup_percentage DECIMAL(5,2),
+    contract_terms TEXT,
+    contract_extra_rules TEXT,
+    contract_language VARCHAR(5) DEFAULT 'en',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS estimate_items (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    estimate_id UUID NOT NULL REFERENCES estimates(id) ON DELETE CASCADE,
+    item_type VARCHAR(50) NOT NULL, -- 'material', 'hardware', 'labor'
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    quantity DECIMAL(10,2) NOT NULL,
+    unit VARCHAR(50) DEFAULT 'pieces',
+    unit_price DECIMAL(10,2) NOT NULL,
+    total_price DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    filename VARCHAR(255) NOT NULL,
+    storage_path VARCHAR(500) NOT NULL,
+    subfolder VARCHAR(255),
+    file_size INTEGER,
+    mime_type VARCHAR(100),
+    include_in_package BOOLEAN DEFAULT TRUE,
+    uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS cut_sheets (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    src VARCHAR(500) NOT NULL,
+    label VARCHAR(100),
+    sheet_number INTEGER,
+    plan_hash VARCHAR(64),
+    layout JSONB,
+    thumb_src VARCHAR(500),
+    medium_src VARCHAR(500),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS stocks (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    category VARCHAR(100) DEFAULT 'Uncategorized',
+    quantity INTEGER DEFAULT 0,
+    unit VARCHAR(50),
+    code VARCHAR(100),
+    color VARCHAR(50),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_user_id ON jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+
+CREATE INDEX IF NOT EXISTS idx_parts_job_id ON parts(job_id);
+CREATE INDEX IF NOT EXISTS idx_parts_material ON parts(material);
+
+CREATE INDEX IF NOT EXISTS idx_deadlines_job_id ON deadlines(job_id);
+CREATE INDEX IF NOT EXISTS idx_deadlines_user_id ON deadlines(user_id);
+CREATE INDEX IF NOT EXISTS idx_deadlines_hard_deadline ON deadlines(hard_deadline);
+
+CREATE INDEX IF NOT EXISTS idx_estimates_job_id ON estimates(job_id);
+CREATE INDEX IF NOT EXISTS idx_estimates_created_at ON estimates(created_at);
+
+CREATE INDEX IF NOT EXISTS idx_estimate_items_estimate_id ON estimate_items(estimate_id);
+
+CREATE INDEX IF NOT EXISTS idx_files_job_id ON files(job_id);
+CREATE INDEX IF NOT EXISTS idx_files_user_id ON files(user_id);
+
+CREATE INDEX IF NOT EXISTS idx_stocks_user_id ON stocks(user_id);
+CREATE INDEX IF NOT EXISTS idx_stocks_category ON stocks(category);
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE TRIGGER update_users_updated_at BEFORE UPDATE ON users
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE OR REPLACE TRIGGER update_jobs_updated_at BEFORE UPDATE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE OR REPLACE TRIGGER update_stocks_updated_at BEFORE UPDATE ON stocks
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,63 @@
+-- Tables and columns that app.py used to ensure on every startup.
+
+ALTER TABLE cut_sheets ADD COLUMN IF NOT EXISTS plan_hash VARCHAR(64);
+ALTER TABLE cut_sheets ADD COLUMN IF NOT EXISTS layout JSONB;
+ALTER TABLE cut_sheets ADD COLUMN IF NOT EXISTS thumb_src VARCHAR(500);
+ALTER TABLE cut_sheets ADD COLUMN IF NOT EXISTS medium_src VARCHAR(500);
+
+ALTER TABLE estimates ADD COLUMN IF NOT EXISTS share_token VARCHAR(64) UNIQUE;
+ALTER TABLE estimates ADD COLUMN IF NOT EXISTS estimate_type VARCHAR(20) DEFAULT 'quote';
+ALTER TABLE estimates ADD COLUMN IF NOT EXISTS contract_terms TEXT;
+ALTER TABLE estimates ADD COLUMN IF NOT EXISTS contract_extra_rules TEXT;
+ALTER TABLE estimates ADD COLUMN IF NOT EXISTS contract_language VARCHAR(5) DEFAULT 'en';
+
+CREATE TABLE IF NOT EXISTS job_templates (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    parts JSONB DEFAULT '[]',
+    accessories JSONB DEFAULT '[]',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+ALTER TABLE job_templates ADD COLUMN IF NOT EXISTS source_job_id UUID REFERENCES jobs(id) ON DELETE SET NULL;
+
+CREATE TABLE IF NOT EXISTS job_accessories (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    quantity DECIMAL(10,2) DEFAULT 1,
+    unit VARCHAR(50) DEFAULT 'pieces',
+    unit_price DECIMAL(10,2) DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS phone VARCHAR(50);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS email VARCHAR(255);
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS address TEXT;
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS notes TEXT;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reset_token_hash VARCHAR(64);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reset_token_expires TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS job_hours (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    hours NUMERIC(6,2) NOT NULL,
+    work_date DATE,
+    notes TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    amount DECIMAL(10,2) NOT NULL,
+    payment_type VARCHAR(50) DEFAULT 'deposit',
+    notes TEXT,
+    paid_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE files ADD COLUMN IF NOT EXISTS include_in_package BOOLEAN DEFAULT TRUE;
@@ -0,0 +1,32 @@
+-- migrate: no-transaction
+-- Composite indexes matching how the routes read each table: filter on the
+-- owning job/user, then return rows in the page's ORDER BY, so Postgres can
+-- walk the index instead of sorting. Built CONCURRENTLY to keep writes
+-- flowing on live tables. check_indexes.py asserts the planner uses them.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_user_created ON jobs (user_id, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_user_status_created ON jobs (user_id, status, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_parts_job_created ON parts (job_id, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_files_job_uploaded ON files (job_id, uploaded_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cut_sheets_job_sheet ON cut_sheets (job_id, sheet_number);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_estimates_job_created ON estimates (job_id, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_estimate_items_estimate_type_created ON estimate_items (estimate_id, item_type, created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_job_paid ON payments (job_id, paid_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_hours_job_work_date ON job_hours (job_id, work_date DESC NULLS LAST, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_accessories_job_created ON job_accessories (job_id, created_at);
+
+-- Partial indexes: only the rows a lookup can match are indexed
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_deadlines_user_hard_deadline ON deadlines (user_id, hard_deadline) WHERE hard_deadline IS NOT NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_reset_token_hash ON users (reset_token_hash) WHERE reset_token_hash IS NOT NULL;
+-- Most estimates are never shared; this replaces the full UNIQUE constraint
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_estimates_share_token ON estimates (share_token) WHERE share_token IS NOT NULL;
+ALTER TABLE estimates DROP CONSTRAINT IF EXISTS estimates_share_token_key;
+
+-- Now covered as the leading column of a composite above; jobs.status alone
+-- is too low-cardinality to be worth an index across every tenant
+DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_status;
+DROP INDEX CONCURRENTLY IF EXISTS idx_parts_job_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_files_job_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_estimates_job_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_estimate_items_estimate_id;
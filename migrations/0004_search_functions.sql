@@ -0,0 +1,17 @@
+-- Trigram search for /jobs?q= and /catalog?q=. Each table's searchable
+-- columns are folded into one string by an IMMUTABLE function (concat_ws
+-- is only STABLE, so it can't be indexed directly); the queries call the
+-- same function, so they match the GIN indexes built in 0005.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION job_search_text(client_name TEXT, email TEXT, phone TEXT, address TEXT, notes TEXT)
+RETURNS TEXT AS $$
+    SELECT coalesce(client_name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(phone, '')
+        || ' ' || coalesce(address, '') || ' ' || coalesce(notes, '')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION template_search_text(name TEXT, description TEXT)
+RETURNS TEXT AS $$
+    SELECT coalesce(name, '') || ' ' || coalesce(description, '')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- GIN trigram indexes serving ILIKE '%q%' and the fuzzy <% operator
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_search_trgm
+    ON jobs USING GIN (job_search_text(client_name, email, phone, address, notes) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_templates_search_trgm
+    ON job_templates USING GIN (template_search_text(name, description) gin_trgm_ops);
@@ -0,0 +1,18 @@
+-- Parts carry a quantity instead of one row per physical piece. Identical
+-- pieces of a job (same size, thickness and material) fold into their
+-- oldest row, so the job's part order is unchanged.
+
+ALTER TABLE parts ADD COLUMN IF NOT EXISTS quantity INTEGER NOT NULL DEFAULT 1;
+
+CREATE TEMP TABLE part_groups ON COMMIT DROP AS
+    SELECT (array_agg(id ORDER BY created_at, id))[1] AS keep_id,
+           array_agg(id) AS ids,
+           sum(quantity) AS total
+    FROM parts
+    GROUP BY job_id, width, height, thickness, material
+    HAVING count(*) > 1;
+
+UPDATE parts p SET quantity = g.total FROM part_groups g WHERE p.id = g.keep_id;
+DELETE FROM parts p USING part_groups g WHERE p.id = ANY(g.ids) AND p.id <> g.keep_id;
+
+ALTER TABLE parts ADD CONSTRAINT parts_quantity_positive CHECK (quantity > 0);
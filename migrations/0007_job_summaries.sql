@@ -0,0 +1,101 @@
+-- One summary row per job, kept current by statement-level triggers on
+-- parts, cut_sheets and payments, so the /jobs list reads a single row per
+-- job instead of aggregating every part. Thickness buckets follow the app:
+-- a part with no thickness counts as 3/4.
+
+CREATE TABLE IF NOT EXISTS job_summaries (
+    job_id UUID PRIMARY KEY REFERENCES jobs(id) ON DELETE CASCADE,
+    pieces_3_4 INTEGER NOT NULL DEFAULT 0,
+    pieces_1_2 INTEGER NOT NULL DEFAULT 0,
+    pieces_1_4 INTEGER NOT NULL DEFAULT 0,
+    pieces_other INTEGER NOT NULL DEFAULT 0,
+    total_pieces INTEGER NOT NULL DEFAULT 0,
+    total_area NUMERIC(14,2) NOT NULL DEFAULT 0, -- square inches
+    sheet_count INTEGER NOT NULL DEFAULT 0,      -- sheets in the last cut plan
+    total_paid DECIMAL(10,2) NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP WITH TIME ZONE     -- newest part, sheet or payment
+);
+
+CREATE OR REPLACE FUNCTION refresh_job_summary(p_job_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    -- Serializes refreshes of one job (without blocking part inserts, which
+    -- only take KEY SHARE on the job row), so the next statement's snapshot
+    -- includes whatever a concurrent writer just committed.
+    PERFORM 1 FROM jobs WHERE id = p_job_id FOR NO KEY UPDATE;
+
+    INSERT INTO job_summaries (job_id, pieces_3_4, pieces_1_2, pieces_1_4, pieces_other,
+                               total_pieces, total_area, sheet_count, total_paid, last_activity_at)
+    SELECT j.id, p.p34, p.p12, p.p14, p.other, p.total, p.area, s.sheets, pay.paid,
+           GREATEST(p.last_at, s.last_at, pay.last_at)
+    FROM jobs j
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(quantity) FILTER (WHERE COALESCE(thickness, '3/4') = '3/4'), 0) AS p34,
+               COALESCE(SUM(quantity) FILTER (WHERE thickness = '1/2'), 0) AS p12,
+               COALESCE(SUM(quantity) FILTER (WHERE thickness = '1/4'), 0) AS p14,
+               COALESCE(SUM(quantity) FILTER (WHERE COALESCE(thickness, '3/4') NOT IN ('3/4', '1/2', '1/4')), 0) AS other,
+               COALESCE(SUM(quantity), 0) AS total,
+               COALESCE(SUM(width * height * quantity), 0) AS area,
+               MAX(created_at) AS last_at
+        FROM parts WHERE job_id = j.id
+    ) p
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS sheets, MAX(created_at) AS last_at FROM cut_sheets WHERE job_id = j.id
+    ) s
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(amount), 0) AS paid, MAX(paid_at) AS last_at FROM payments WHERE job_id = j.id
+    ) pay
+    -- A job being deleted has no row left here, so cascaded deletes of its
+    -- children don't resurrect a summary for it
+    WHERE j.id = p_job_id
+    ON CONFLICT (job_id) DO UPDATE SET
+        pieces_3_4 = EXCLUDED.pieces_3_4,
+        pieces_1_2 = EXCLUDED.pieces_1_2,
+        pieces_1_4 = EXCLUDED.pieces_1_4,
+        pieces_other = EXCLUDED.pieces_other,
+        total_pieces = EXCLUDED.total_pieces,
+        total_area = EXCLUDED.total_area,
+        sheet_count = EXCLUDED.sheet_count,
+        total_paid = EXCLUDED.total_paid,
+        last_activity_at = EXCLUDED.last_activity_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level with transition tables: a 1,000-row COPY of parts
+-- refreshes its job once, not 1,000 times. Postgres allows transition
+-- tables on single-event triggers only, hence one trigger per event.
+CREATE OR REPLACE FUNCTION refresh_job_summaries_for_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_job_summary(job_id) FROM (SELECT DISTINCT job_id FROM new_rows) t;
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_job_summary(job_id)
+        FROM (SELECT job_id FROM new_rows UNION SELECT job_id FROM old_rows) t;
+    ELSE
+        PERFORM refresh_job_summary(job_id) FROM (SELECT DISTINCT job_id FROM old_rows) t;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['parts', 'cut_sheets', 'payments'] LOOP
+        EXECUTE format('CREATE OR REPLACE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION refresh_job_summaries_for_rows()',
+                       tbl || '_summary_insert', tbl);
+        EXECUTE format('CREATE OR REPLACE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION refresh_job_summaries_for_rows()',
+                       tbl || '_summary_update', tbl);
+        EXECUTE format('CREATE OR REPLACE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION refresh_job_summaries_for_rows()',
+                       tbl || '_summary_delete', tbl);
+    END LOOP;
+END;
+$$;
+
+-- Backfill every existing job
+SELECT refresh_job_summary(id) FROM jobs;
@@ -0,0 +1,17 @@
+-- migrate: no-transaction
+-- Listings page by keyset on their full sort order, id last as the
+-- tiebreaker; with id in the index the "after cursor" row comparison is a
+-- single index seek. Replaces the shorter indexes from 0003.
+
+-- A NULL sort key would fall out of every page after the first
+UPDATE jobs SET created_at = NOW() WHERE created_at IS NULL;
+ALTER TABLE jobs ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_user_created_id ON jobs (user_id, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_user_status_created_id ON jobs (user_id, status, created_at DESC, id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_job_templates_name_id ON job_templates (name, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stocks_user_category_name_id ON stocks (user_id, (COALESCE(category, '')), name, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_user_created;
+DROP INDEX CONCURRENTLY IF EXISTS idx_jobs_user_status_created;
+DROP INDEX CONCURRENTLY IF EXISTS idx_stocks_user_id;
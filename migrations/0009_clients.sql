@@ -0,0 +1,46 @@
+-- One row per client of a user, matched by name ignoring case and
+-- surrounding spaces (name_key). Jobs link to it through client_id and keep
+-- their own contact columns as the details used for that job.
+
+CREATE TABLE IF NOT EXISTS clients (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    name_key VARCHAR(255) GENERATED ALWAYS AS (lower(trim(name))) STORED,
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    address TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_user_name_key ON clients (user_id, name_key);
+-- Prefix lookups for the create-job autocomplete (name_key LIKE 'abc%')
+CREATE INDEX IF NOT EXISTS idx_clients_user_name_key_prefix ON clients (user_id, name_key text_pattern_ops);
+
+DROP TRIGGER IF EXISTS update_clients_updated_at ON clients;
+CREATE TRIGGER update_clients_updated_at BEFORE UPDATE ON clients
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS client_id UUID REFERENCES clients(id) ON DELETE SET NULL;
+
+-- Dedupe: one client per user and normalized name, named as on the most
+-- recent job, with the most recent non-blank email/phone/address
+INSERT INTO clients (user_id, name, email, phone, address, created_at)
+SELECT user_id,
+       (array_agg(trim(client_name) ORDER BY created_at DESC))[1],
+       (array_agg(trim(email) ORDER BY created_at DESC) FILTER (WHERE trim(email) <> ''))[1],
+       (array_agg(trim(phone) ORDER BY created_at DESC) FILTER (WHERE trim(phone) <> ''))[1],
+       (array_agg(trim(address) ORDER BY created_at DESC) FILTER (WHERE trim(address) <> ''))[1],
+       min(created_at)
+FROM jobs
+WHERE trim(client_name) <> ''
+GROUP BY user_id, lower(trim(client_name))
+ON CONFLICT (user_id, name_key) DO NOTHING;
+
+-- Linking isn't activity: keep jobs.updated_at as it was
+ALTER TABLE jobs DISABLE TRIGGER update_jobs_updated_at;
+UPDATE jobs j SET client_id = c.id
+FROM clients c
+WHERE j.client_id IS NULL AND c.user_id = j.user_id AND c.name_key = lower(trim(j.client_name));
+ALTER TABLE jobs ENABLE TRIGGER update_jobs_updated_at;
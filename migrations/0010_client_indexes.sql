@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- /clients totals each client's jobs and lists them newest first, and
+-- /jobs?client_id= pages through them, all by client_id.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_jobs_client_created ON jobs (client_id, created_at DESC);
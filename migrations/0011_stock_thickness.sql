@@ -0,0 +1,31 @@
+-- Stock items carry the sheet thickness and material they stock, parsed
+-- from the item name, so the job page's stock check is an equality lookup
+-- instead of a `name ILIKE '%3/4%'` scan per thickness. Only sheet goods get
+-- a thickness: "3/4 Panel" does, "Screws 3/4 inch" doesn't. add_stock calls
+-- the same functions, so new items are parsed the way existing ones were.
+
+CREATE OR REPLACE FUNCTION stock_material(name TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN name ~* 'melamine' THEN 'Melamine'
+        WHEN name ~* '\mmdf\M' THEN 'MDF'
+        WHEN name ~* 'particle' THEN 'Particleboard'
+        WHEN name ~* 'plywood|\mply\M' THEN 'Plywood'
+        WHEN name ~* 'panel|board|sheet' THEN 'Panel'
+    END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION stock_thickness(name TEXT, unit TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE WHEN stock_material(name) IS NOT NULL OR unit ~* '^\s*sheet'
+                THEN substring(name from '(\d+/\d+)') END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+ALTER TABLE stocks ADD COLUMN IF NOT EXISTS thickness VARCHAR(50);
+ALTER TABLE stocks ADD COLUMN IF NOT EXISTS material VARCHAR(100);
+
+-- Parsing isn't an edit: keep stocks.updated_at as it was
+ALTER TABLE stocks DISABLE TRIGGER update_stocks_updated_at;
+UPDATE stocks SET thickness = stock_thickness(name, unit), material = stock_material(name)
+WHERE thickness IS NULL AND material IS NULL;
+ALTER TABLE stocks ENABLE TRIGGER update_stocks_updated_at;
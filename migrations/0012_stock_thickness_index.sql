@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- check_material_stock sums quantity per (user, thickness); INCLUDE lets it
+-- answer from the index alone.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stocks_user_thickness ON stocks (user_id, thickness) INCLUDE (quantity) WHERE thickness IS NOT NULL;
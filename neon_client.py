@@ -1,6 +1,17 @@
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain, islice
 import psycopg2
 from psycopg2 import pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
 
@@ -8,54 +19,427 @@ load_dotenv()  # Load from .env
 
 NEON_CONNECTION_STRING = os.getenv("NEON_CONNECTION_STRING")
 
-print(f"🔧 Neon Connection String present: {bool(NEON_CONNECTION_STRING)}")
-if NEON_CONNECTION_STRING:
-    print(f"🔧 Connection string starts with: {NEON_CONNECTION_STRING[:20]}...")
-
-if not NEON_CONNECTION_STRING:
-    print("❌ Missing Neon connection string!")
-    raise Exception("Missing Neon connection string")
-
-print("✅ Testing Neon connection...")
-
-try:
-    # Test connection
-    conn = psycopg2.connect(NEON_CONNECTION_STRING)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute("SELECT version();")
-    version = cursor.fetchone()
-    print(f"✅ Connected to PostgreSQL: {version['version']}")
-    cursor.close()
-    conn.close()
-    print("✅ Neon client configured successfully")
-except Exception as e:
-    print(f"❌ Failed to connect to Neon: {e}")
-    raise
+# Pool bounds; override per deployment (e.g. fewer per worker when running
+# many gunicorn workers against a small Neon compute).
+POOL_MIN = int(os.getenv("NEON_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("NEON_POOL_MAX", "10"))
+
+# Adaptive sizing: the number of connections allowed out at once starts at
+# POOL_MAX and grows towards POOL_CEILING while checkouts have to queue,
+# shrinking back when load drops; the idle connections kept open (minconn)
+# follow the recent peak. Equal bounds (the default) mean a fixed size.
+POOL_CEILING = max(POOL_MAX, int(os.getenv("NEON_POOL_CEILING", str(POOL_MAX))))
+POOL_TIMEOUT = float(os.getenv("NEON_POOL_TIMEOUT", "10"))
+POOL_ADAPT_INTERVAL = float(os.getenv("NEON_POOL_ADAPT_INTERVAL", "30"))
+
+# Optional keep-warm: Neon suspends an idle compute (after 5 minutes by
+# default) and the next request pays a multi-second cold start. With
+# NEON_KEEPWARM=1, a background thread pings every NEON_KEEPWARM_INTERVAL
+# seconds during business hours (NEON_KEEPWARM_HOURS, e.g. "7-19", on
+# NEON_KEEPWARM_DAYS, Mon=0, in NEON_KEEPWARM_TZ or server time), skipping
+# the ping whenever this process ran real queries more recently than that.
+KEEPWARM = os.getenv("NEON_KEEPWARM") == "1"
+KEEPWARM_INTERVAL = float(os.getenv("NEON_KEEPWARM_INTERVAL", "240"))
+KEEPWARM_HOURS = os.getenv("NEON_KEEPWARM_HOURS", "7-19")
+KEEPWARM_DAYS = os.getenv("NEON_KEEPWARM_DAYS", "0-5")
+KEEPWARM_TZ = os.getenv("NEON_KEEPWARM_TZ")
+
+# Checkout wait-time histogram bucket upper bounds, in ms (last is "more")
+WAIT_BUCKETS_MS = (1, 5, 25, 100, 500, 2000)
+
+# Row count from which execute_batch_insert streams with COPY FROM STDIN
+# instead of multi-row INSERTs: COPY skips per-statement parsing entirely,
+# but isn't worth its extra protocol round trip for a few dozen rows.
+COPY_THRESHOLD = int(os.getenv("NEON_COPY_THRESHOLD", "1000"))
+
+# Rows per round trip for stream_query's server-side cursors.
+STREAM_ITERSIZE = int(os.getenv("NEON_STREAM_ITERSIZE", "2000"))
+
+# Server-side prepared statements per connection (LRU). Neon's "-pooler"
+# endpoint runs PgBouncer in transaction mode, where a PREPAREd name isn't
+# guaranteed to exist on the next transaction's backend, so it's off there
+# unless forced with NEON_PREPARED_STATEMENTS=1.
+PREPARE_CACHE_SIZE = int(os.getenv("NEON_PREPARE_CACHE_SIZE", "64"))
+PREPARED_STATEMENTS = os.getenv(
+    "NEON_PREPARED_STATEMENTS",
+    "0" if "-pooler" in (NEON_CONNECTION_STRING or "") else "1",
+) == "1"
 
 # Reused across requests instead of opening a fresh TCP+TLS connection per
 # query — that was adding ~0.5s per query and made large jobs (100+ parts)
 # time out mid-request before cut sheets ever got generated.
-_pool = psycopg2.pool.ThreadedConnectionPool(1, 10, NEON_CONNECTION_STRING)
+# Created lazily on first use so importing this module never touches the
+# network (CLI scripts, tests, and worker boot don't wait on a cold Neon).
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# Pools inherited across a fork (gunicorn --preload builds one in the master
+# while running startup DDL). The child must not use those sockets, and must
+# not close them either: PQfinish sends a Terminate message that would end
+# the parent's server session. Keeping a reference means they're never
+# garbage-collected (and closed) in the child; the child builds its own pool.
+_inherited_pools = []
+
+# psycopg2's pool raises PoolError the moment it's exhausted; checkouts queue
+# on this gate instead (up to POOL_TIMEOUT), which is also where waits are
+# measured. _limit is the adaptive cap on connections out at once.
+_gate = threading.Condition()
+_in_use = 0
+_limit = POOL_MAX
+
+def _new_pool_stats():
+    return {
+        "checkouts": 0, "waits": 0, "timeouts": 0, "discards": 0,
+        "wait_histogram": [0] * (len(WAIT_BUCKETS_MS) + 1),
+        "wait_ms_total": 0.0, "peak_in_use": 0,
+    }
+
+_pool_stats = _new_pool_stats()
+_window = {"started": time.monotonic(), "waits": 0, "peak": 0}
+_last_used = 0.0  # time.monotonic() of the last connection returned
+_keepwarm_pid = None
+
+def _after_fork_in_child():
+    global _pool, _pool_pid, _pool_lock, _gate, _in_use, _limit, _pool_stats, _keepwarm_pid
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_pid = None
+    # The locks may have been held by another thread at fork time
+    _pool_lock = threading.Lock()
+    _gate = threading.Condition()
+    _in_use = 0
+    _limit = POOL_MAX
+    _pool_stats = _new_pool_stats()
+    _window.update(started=time.monotonic(), waits=0, peak=0)
+    # Threads don't survive a fork; let start_keepwarm() run again here
+    _keepwarm_pid = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has PREPAREd. The cache
+    lives on the connection object, so a reconnect starts from an empty one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()  # sql text -> statement name, LRU order
+
+def configure(minconn=None, maxconn=None, ceiling=None):
+    """Override pool bounds. Only affects a pool that hasn't been created yet."""
+    global POOL_MIN, POOL_MAX, POOL_CEILING, _limit
+    if minconn is not None:
+        POOL_MIN = int(minconn)
+    if maxconn is not None:
+        POOL_MAX = _limit = int(maxconn)
+    if ceiling is not None:
+        POOL_CEILING = int(ceiling)
+    POOL_CEILING = max(POOL_CEILING, POOL_MAX)
+
+def _get_pool():
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid != os.getpid():
+        # Forked without the at-fork hook running (e.g. a C-level fork)
+        _after_fork_in_child()
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if not NEON_CONNECTION_STRING:
+                    raise Exception("Missing Neon connection string")
+                # maxconn is the hard ceiling; _gate enforces the adaptive limit
+                new_pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN, POOL_CEILING, NEON_CONNECTION_STRING,
+                    connection_factory=PreparingConnection,
+                )
+                _pool_pid = os.getpid()  # set first: readers check _pool, then the pid
+                _pool = new_pool
+    return _pool
+
+def warmup():
+    """Create the pool now and check the server answers, instead of paying
+    for it on the first request. Safe to call more than once."""
+    conn = get_db_connection()
+    stale = False
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute("SELECT version();")
+            version = cursor.fetchone()
+            conn.commit()
+        finally:
+            cursor.close()
+        print(f"✅ Connected to PostgreSQL: {version['version']}")
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        stale = True
+        raise
+    finally:
+        _release(conn, discard=stale)
+
+def _record_wait(waited_ms):
+    # Called under _gate, like every other _pool_stats update
+    stats = _pool_stats
+    stats["checkouts"] += 1
+    stats["wait_ms_total"] += waited_ms
+    for i, bound in enumerate(WAIT_BUCKETS_MS):
+        if waited_ms <= bound:
+            stats["wait_histogram"][i] += 1
+            break
+    else:
+        stats["wait_histogram"][-1] += 1
+
+def _adapt(pool_obj):
+    """Once per POOL_ADAPT_INTERVAL (called under _gate): raise the limit if
+    anyone had to queue, lower it if the peak stayed under half of it, and
+    keep about as many idle connections open as the recent peak used."""
+    global _limit
+    if _window["waits"] and _limit < POOL_CEILING:
+        _limit = min(POOL_CEILING, _limit + max(1, _limit // 4))
+        _gate.notify_all()
+    elif _window["peak"] * 2 <= _limit and _limit > POOL_MAX:
+        _limit -= 1
+    pool_obj.minconn = max(POOL_MIN, min(_window["peak"], _limit))
+    _window.update(started=time.monotonic(), waits=0, peak=_in_use)
 
 def get_db_connection():
-    """Borrow a connection from the pool"""
-    return _pool.getconn()
+    """Borrow a connection from the pool, queueing for up to POOL_TIMEOUT
+    seconds when the limit is reached."""
+    global _in_use
+    pool_obj = _get_pool()
+    gate = _gate
+    started = time.perf_counter()
+    with gate:
+        if _in_use >= _limit:
+            _window["waits"] += 1
+            _pool_stats["waits"] += 1
+            deadline = time.monotonic() + POOL_TIMEOUT
+            while _in_use >= _limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    _pool_stats["timeouts"] += 1
+                    raise psycopg2.pool.PoolError(
+                        f"timed out after {POOL_TIMEOUT:g}s waiting for a database connection")
+                gate.wait(remaining)
+        _in_use += 1
+        _window["peak"] = max(_window["peak"], _in_use)
+        _pool_stats["peak_in_use"] = max(_pool_stats["peak_in_use"], _in_use)
+        if time.monotonic() - _window["started"] >= POOL_ADAPT_INTERVAL:
+            _adapt(pool_obj)
+    try:
+        conn = pool_obj.getconn()
+    except Exception:
+        with gate:
+            _in_use -= 1
+            gate.notify()
+        raise
+    with gate:
+        _record_wait((time.perf_counter() - started) * 1000)
+    return conn
 
 def _release(conn, discard=False):
-    if discard:
+    global _in_use, _last_used
+    _last_used = time.monotonic()
+    try:
         # Neon can drop idle connections (e.g. compute auto-suspend); don't
         # hand a dead connection back to the pool.
-        _pool.putconn(conn, close=True)
-    else:
-        _pool.putconn(conn)
+        _get_pool().putconn(conn, close=discard)
+    finally:
+        with _gate:
+            if discard:
+                _pool_stats["discards"] += 1
+            _in_use = max(0, _in_use - 1)
+            _gate.notify()
+
+def _parse_range(spec):
+    start, _, end = spec.partition("-")
+    return int(start), int(end or start)
+
+def _in_business_hours(now=None):
+    if now is None:
+        if KEEPWARM_TZ:
+            from zoneinfo import ZoneInfo
+            now = datetime.now(ZoneInfo(KEEPWARM_TZ))
+        else:
+            now = datetime.now()
+    first_day, last_day = _parse_range(KEEPWARM_DAYS)
+    start_hour, end_hour = _parse_range(KEEPWARM_HOURS)
+    return first_day <= now.weekday() <= last_day and start_hour <= now.hour < end_hour
+
+def _keepwarm_loop():
+    while True:
+        time.sleep(KEEPWARM_INTERVAL)
+        if time.monotonic() - _last_used < KEEPWARM_INTERVAL or not _in_business_hours():
+            continue
+        try:
+            execute_query("SELECT 1")
+        except Exception as e:
+            print(f"⚠️ Neon keep-warm ping failed: {e}")
+
+def start_keepwarm():
+    """Start the keep-warm thread if NEON_KEEPWARM=1. Once per process. Under
+    gunicorn, gunicorn.conf.py calls this in exactly one worker: threads don't
+    survive the fork from a --preload master, and one ping covers them all."""
+    global _keepwarm_pid
+    if not KEEPWARM or _keepwarm_pid == os.getpid():
+        return False
+    _keepwarm_pid = os.getpid()
+    threading.Thread(target=_keepwarm_loop, name="neon-keepwarm", daemon=True).start()
+    print(f"🔥 Neon keep-warm on: every {KEEPWARM_INTERVAL:g}s, days {KEEPWARM_DAYS}, hours {KEEPWARM_HOURS}")
+    return True
+
+def pool_stats():
+    """Snapshot of this process's pool: connections in use and idle, the
+    current adaptive limit/minconn, checkout wait-time histogram (buckets
+    are upper bounds in ms), and discarded stale connections."""
+    with _gate:
+        stats = dict(_pool_stats, wait_histogram=list(_pool_stats["wait_histogram"]))
+        stats.update(
+            in_use=_in_use,
+            idle=len(_pool._pool) if _pool is not None else 0,
+            limit=_limit,
+            minconn=_pool.minconn if _pool is not None else POOL_MIN,
+            ceiling=POOL_CEILING,
+            wait_buckets_ms=list(WAIT_BUCKETS_MS) + [None],
+        )
+    return stats
+
+# Optional per-statement hook, called as recorder(sql, seconds) after every
+# statement (see db_stats.py). None when instrumentation is off, which keeps
+# the query path to a single attribute check.
+_recorder = None
+
+def set_query_recorder(recorder):
+    """Install (or with None, remove) the per-statement timing hook."""
+    global _recorder
+    _recorder = recorder
+
+_prepare_stats = {"hits": 0, "prepares": 0, "evictions": 0, "failures": 0, "replans": 0}
+
+# SQL texts seen at least once, so one-off statements are never prepared —
+# a PREPARE only pays off from the second execution on. Shared by every
+# thread of the process, so _prepare_lock guards them and _prepare_stats.
+_seen_sql = OrderedDict()
+_unpreparable = set()
+_prepare_lock = threading.Lock()
+
+# EXECUTE errors that mean "this prepared statement is no longer usable" but
+# not that the query is wrong: the server session lost it (reset behind a
+# pooler), or a migration changed a table it reads while this worker kept
+# serving ("cached plan must not change result type").
+_STALE_PREPARED = (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported)
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+_PREPARABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+def prepare_stats():
+    """Counters for the prepared-statement cache since process start: `hits`
+    (EXECUTEs of an already-prepared statement), `prepares`, `evictions`
+    (LRU DEALLOCATEs), `failures` (statements Postgres wouldn't prepare) and
+    `replans` (stale statements dropped and re-run unprepared)."""
+    with _prepare_lock:
+        return dict(_prepare_stats)
+
+def _count(stat):
+    with _prepare_lock:
+        _prepare_stats[stat] += 1
+
+def _preparable(query, params):
+    if not PREPARED_STATEMENTS or not params or not isinstance(params, (tuple, list)):
+        return False
+    if "%(" in query or ";" in query.rstrip().rstrip(";"):
+        return False
+    with _prepare_lock:
+        if query in _unpreparable:
+            return False
+    return query.lstrip().upper().startswith(_PREPARABLE)
+
+def _seen_before(query):
+    with _prepare_lock:
+        if query in _seen_sql:
+            _seen_sql.move_to_end(query)
+            return True
+        _seen_sql[query] = True
+        if len(_seen_sql) > PREPARE_CACHE_SIZE * 4:
+            _seen_sql.popitem(last=False)
+        return False
+
+def _to_server_placeholders(query):
+    # psycopg2's %s / %% become PREPARE's $1..$n / a literal %
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group() == "%%" else f"${next(counter)}", query)
+
+def _execute(conn, cursor, query, params):
+    """cursor.execute(query, params), routed through a named server-side
+    prepared statement when the same SQL text repeats.
+
+    Prepared statements are only used when the statement starts its own
+    transaction (or runs in autocommit): if the EXECUTE turns out to be
+    stale, rolling back loses nothing and the query is re-run unprepared.
+    Inside an already-open transaction statements run as plain SQL."""
+    cache = getattr(conn, "prepared", None)
+    if (cache is None or not _preparable(query, params)
+            or not (conn.autocommit or conn.info.transaction_status == TRANSACTION_STATUS_IDLE)):
+        cursor.execute(query, params)
+        return
+
+    name = cache.get(query)
+    if name is not None:
+        cache.move_to_end(query)
+        _count("hits")
+    elif _seen_before(query):
+        name = "nc_" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+        try:
+            cursor.execute(f"PREPARE {name} AS {_to_server_placeholders(query)}")
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error:
+            # Rejected (e.g. a parameter type it can't infer): nothing ran
+            # before it in this transaction, so rolling back is safe
+            if not conn.autocommit:
+                conn.rollback()
+            with _prepare_lock:
+                _unpreparable.add(query)
+            _count("failures")
+            cursor.execute(query, params)
+            return
+        cache[query] = name
+        _count("prepares")
+        if len(cache) > PREPARE_CACHE_SIZE:
+            _, evicted = cache.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {evicted}")
+            _count("evictions")
+
+    if name is None:
+        cursor.execute(query, params)
+        return
+    try:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    except _STALE_PREPARED as e:
+        if not conn.autocommit:
+            conn.rollback()
+        if isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+            # The session lost every statement, not just this one
+            cache.clear()
+        else:
+            cache.pop(query, None)
+            cursor.execute(f"DEALLOCATE {name}")
+        # Seen afresh from here, so it's re-prepared against the new schema
+        # on its next repeat
+        with _prepare_lock:
+            _seen_sql.pop(query, None)
+            _prepare_stats["replans"] += 1
+        cursor.execute(query, params)
 
 def _execute_once(query, params, fetch, fetch_one):
+    recorder = _recorder
+    started = time.perf_counter() if recorder else 0
     conn = get_db_connection()
     stale = False
     try:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         try:
-            cursor.execute(query, params)
+            _execute(conn, cursor, query, params)
             if fetch_one:
                 result = cursor.fetchone()
             elif fetch:
@@ -76,6 +460,8 @@ def _execute_once(query, params, fetch, fetch_one):
         raise
     finally:
         _release(conn, discard=stale)
+        if recorder:
+            recorder(query, time.perf_counter() - started)
 
 def _run(query, params, fetch, fetch_one):
     try:
@@ -91,15 +477,121 @@ def execute_single(query, params=None):
     """Execute a query and fetch a single result"""
     return _run(query, params, fetch=True, fetch_one=True)
 
-def _execute_batch_once(query_template, rows):
+# Lists of ids bind as one array parameter, `col = ANY(%s::uuid[])`, never as
+# `col::text IN (%s, %s, ...)`: the statement text is the same for any list
+# length (so it is prepared once), and comparing the uuid column itself
+# keeps its index usable.
+def any_uuid(column):
+    """`column = ANY(%s::uuid[])`; bind uuid_array(ids) to the placeholder."""
+    return f"{column} = ANY(%s::uuid[])"
+
+def uuid_array(ids):
+    """ids (UUIDs or strings) as a Postgres array literal for a %s::uuid[]
+    placeholder. It's passed as an untyped string so it also coerces when
+    bound to a prepared statement's uuid[] parameter, which a text[] would
+    not. Raises ValueError for anything that isn't a UUID."""
+    return "{" + ",".join(str(uuid.UUID(str(i))) for i in ids) + "}"
+
+# Only plain "INSERT INTO t (cols) VALUES %s" templates map onto COPY;
+# anything with ON CONFLICT, RETURNING or expressions stays on execute_values.
+_COPYABLE_INSERT = re.compile(r"^\s*INSERT\s+INTO\s+([\w.]+)\s*\(([^)]*)\)\s*VALUES\s+%s\s*$", re.I)
+
+def _copy_value(value):
+    # COPY text format: tab-separated, \N for NULL, backslash escapes
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+class _CopyStream:
+    """File-like object that renders rows to COPY text format as copy_expert
+    reads it, so an iterator of rows is never materialized. With ids=True a
+    fresh uuid4 is prepended to each row (COPY has no RETURNING) and kept."""
+
+    def __init__(self, rows, table, columns, ids=False):
+        self.rows = rows
+        self.table, self.columns = table, columns
+        self.replayable = isinstance(rows, (list, tuple))
+        self.ids = [] if ids else None
+        self.count = 0
+        self.started = False
+        self._iter = iter(rows)
+        self._pending = ""
+
+    @property
+    def sql(self):
+        columns = f"id, {self.columns}" if self.ids is not None else self.columns
+        return f"COPY {self.table} ({columns}) FROM STDIN"
+
+    def read(self, size=-1):
+        self.started = True
+        chunks, length = [self._pending], len(self._pending)
+        while size < 0 or length < size:
+            row = next(self._iter, None)
+            if row is None:
+                break
+            if self.ids is not None:
+                row_id = str(uuid.uuid4())
+                self.ids.append(row_id)
+                row = (row_id, *row)
+            line = "\t".join(_copy_value(v) for v in row) + "\n"
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = "".join(chunks)
+        if size < 0:
+            size = len(data)
+        self._pending = data[size:]
+        return data[:size]
+
+    def rewound(self):
+        """A stream that starts from the first row again, or None if rows
+        have already been pulled from a one-shot iterator."""
+        if not self.started:
+            return self
+        if self.replayable:
+            return _CopyStream(self.rows, self.table, self.columns, ids=self.ids is not None)
+        return None
+
+def _batch_source(query_template, rows, returning_ids):
+    """What to send for `rows`: a list for execute_values, or a _CopyStream
+    when there are at least COPY_THRESHOLD rows and the template allows it.
+    Iterators are only read as far as needed to make that call."""
+    target = _COPYABLE_INSERT.match(query_template)
+    if not isinstance(rows, (list, tuple)):
+        it = iter(rows)
+        head = list(islice(it, COPY_THRESHOLD))
+        if target is None or len(head) < COPY_THRESHOLD:
+            return head + list(it)
+        rows = chain(head, it)
+    elif target is None or len(rows) < COPY_THRESHOLD:
+        return rows
+    return _CopyStream(rows, target.group(1), target.group(2).strip(), ids=returning_ids)
+
+def _batch_insert(cursor, query_template, source, returning_ids):
+    if isinstance(source, _CopyStream):
+        cursor.copy_expert(source.sql, source)
+        return source.ids if returning_ids else source.count
+    if returning_ids:
+        return [str(row[0]) for row in execute_values(cursor, query_template + " RETURNING id", source, fetch=True)]
+    execute_values(cursor, query_template, source)
+    return cursor.rowcount
+
+def _execute_batch_once(query_template, source, returning_ids):
+    recorder = _recorder
+    started = time.perf_counter() if recorder else 0
     conn = get_db_connection()
     stale = False
     try:
         cursor = conn.cursor()
         try:
-            execute_values(cursor, query_template, rows)
+            result = _batch_insert(cursor, query_template, source, returning_ids)
             conn.commit()
-            return cursor.rowcount
+            return result
         finally:
             cursor.close()
     except (psycopg2.OperationalError, psycopg2.InterfaceError):
@@ -110,13 +602,241 @@ def _execute_batch_once(query_template, rows):
         raise
     finally:
         _release(conn, discard=stale)
+        if recorder:
+            recorder(query_template, time.perf_counter() - started)
+
+def execute_batch_insert(query_template, rows, returning_ids=False):
+    """Insert many rows. query_template looks like
+    'INSERT INTO t (a, b) VALUES %s' — psycopg2 expands %s per row of `rows`.
+
+    `rows` may be a list or any iterable (e.g. a generator). From
+    COPY_THRESHOLD rows on, a plain template is sent as COPY FROM STDIN,
+    streamed straight from the iterable. Returns the row count, or with
+    returning_ids=True the new rows' ids as strings (the table needs a UUID
+    `id`; on the COPY path they're generated client-side).
 
-def execute_batch_insert(query_template, rows):
-    """Insert many rows in one round trip. query_template looks like
-    'INSERT INTO t (a, b) VALUES %s' — psycopg2 expands %s per row of `rows`."""
-    if not rows:
-        return 0
+    A stale connection is retried like every other helper, except when it
+    drops mid-COPY after rows were already pulled from a one-shot iterator."""
+    source = _batch_source(query_template, rows, returning_ids)
+    if not isinstance(source, _CopyStream) and not source:
+        return [] if returning_ids else 0
     try:
-        return _execute_batch_once(query_template, rows)
+        return _execute_batch_once(query_template, source, returning_ids)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        if isinstance(source, _CopyStream):
+            source = source.rewound()
+            if source is None:
+                raise
+        return _execute_batch_once(query_template, source, returning_ids)
+
+class Transaction:
+    """Handle yielded by transaction(). Same calls as the module-level helpers,
+    but every statement runs on one connection inside one transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = 0
+
+    def _run(self, query, work, retryable=None):
+        recorder = _recorder
+        started = time.perf_counter() if recorder else 0
+        try:
+            try:
+                return work(self.conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if self.statements or (retryable and not retryable()):
+                    raise
+                # Nothing has run on this connection yet, so it's safe to
+                # swap a stale one for a fresh one and try again.
+                stale, self.conn = self.conn, None
+                _release(stale, discard=True)
+                self.conn = get_db_connection()
+                return work(self.conn)
+        finally:
+            self.statements += 1
+            if recorder:
+                recorder(query, time.perf_counter() - started)
+
+    def execute(self, query, params=None, fetch=False):
+        """Like execute_query: rows if fetch, else the affected row count."""
+        def work(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                _execute(conn, cursor, query, params)
+                return cursor.fetchall() if fetch else cursor.rowcount
+            finally:
+                cursor.close()
+        return self._run(query, work)
+
+    def execute_single(self, query, params=None):
+        """Like execute_single: the first row, or None."""
+        def work(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                _execute(conn, cursor, query, params)
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+        return self._run(query, work)
+
+    def execute_batch_insert(self, query_template, rows, returning_ids=False):
+        """Like execute_batch_insert (COPY above the threshold included),
+        without committing."""
+        source = _batch_source(query_template, rows, returning_ids)
+        if not isinstance(source, _CopyStream):
+            if not source:
+                return [] if returning_ids else 0
+            retryable = None
+        else:
+            retryable = lambda: source.rewound() is not None
+        def work(conn):
+            cursor = conn.cursor()
+            try:
+                send = source.rewound() if isinstance(source, _CopyStream) else source
+                return _batch_insert(cursor, query_template, send, returning_ids)
+            finally:
+                cursor.close()
+        return self._run(query_template, work, retryable)
+
+@contextmanager
+def transaction():
+    """Unit of work: `with transaction() as tx:` runs every tx.execute* call
+    on one pooled connection and commits once when the block exits, or rolls
+    everything back if it raises. Saves a checkout, BEGIN and COMMIT (and a
+    WAL flush) per statement and makes multi-statement writes atomic.
+
+    A stale connection is only retried on the block's first statement; after
+    that the error propagates, since earlier statements can't be replayed."""
+    tx = Transaction(get_db_connection())
+    stale = False
+    try:
+        yield tx
+        tx.conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        stale = True
+        raise
+    except BaseException:
+        if tx.conn is not None:
+            tx.conn.rollback()
+        raise
+    finally:
+        if tx.conn is not None:
+            _release(tx.conn, discard=stale)
+
+def _execute_reads_once(queries):
+    conn = get_db_connection()
+    stale = False
+    try:
+        # Autocommit skips the BEGIN and COMMIT round trips psycopg2 wraps
+        # around every statement in transactional mode; reads don't need them.
+        conn.autocommit = True
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            results = {}
+            recorder = _recorder
+            for name, spec in queries.items():
+                query, params = spec[0], spec[1]
+                started = time.perf_counter() if recorder else 0
+                _execute(conn, cursor, query, params)
+                results[name] = cursor.fetchone() if len(spec) > 2 and spec[2] == "one" else cursor.fetchall()
+                if recorder:
+                    recorder(query, time.perf_counter() - started)
+            return results
+        finally:
+            cursor.close()
     except (psycopg2.OperationalError, psycopg2.InterfaceError):
-        return _execute_batch_once(query_template, rows)
\ No newline at end of file
+        stale = True
+        raise
+    finally:
+        if not stale:
+            conn.autocommit = False
+        _release(conn, discard=stale)
+
+def execute_reads(queries):
+    """Run several independent read queries on one pooled connection and
+    return {name: rows}. `queries` maps a name to (sql, params), or to
+    (sql, params, "one") to fetch a single row (None if there isn't one).
+
+    psycopg2 has no pipeline mode and can't return more than one result set
+    per call, so this is one round trip per query — but without a pool
+    checkout, BEGIN and COMMIT for each, which is 3x fewer round trips than
+    calling execute_query in a loop."""
+    if not queries:
+        return {}
+    try:
+        return _execute_reads_once(queries)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return _execute_reads_once(queries)
+
+class RowStream:
+    """Rows of a stream_query, fetched `itersize` at a time from a server-side
+    cursor. Iterate it once; `columns` holds the result's column names."""
+
+    def __init__(self, cursor, first_batch):
+        self.columns = [col[0] for col in cursor.description or ()]
+        self._cursor = cursor
+        self._first = first_batch
+
+    def __iter__(self):
+        first, self._first = self._first, []
+        yield from first
+        yield from self._cursor
+
+def _open_stream(query, params, itersize, tuples):
+    recorder = _recorder
+    started = time.perf_counter() if recorder else 0
+    conn = get_db_connection()
+    try:
+        # A named cursor is a server-side DECLARE ... CURSOR: rows stay on
+        # the server until fetched, instead of all arriving on execute().
+        cursor = conn.cursor(
+            name=f"nc_stream_{uuid.uuid4().hex}",
+            cursor_factory=None if tuples else RealDictCursor,
+        )
+        cursor.itersize = itersize
+        cursor.execute(query, params)
+        # Fetch the first batch now: it fills cursor.description, and a
+        # stale connection shows up here, while a retry is still possible.
+        first_batch = cursor.fetchmany(itersize)
+        return conn, cursor, first_batch
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        _release(conn, discard=True)
+        raise
+    except Exception:
+        conn.rollback()
+        _release(conn)
+        raise
+    finally:
+        if recorder:
+            recorder(query, time.perf_counter() - started)
+
+@contextmanager
+def stream_query(query, params=None, itersize=None, tuples=False):
+    """Stream a large result with flat memory use:
+
+        with stream_query("SELECT * FROM parts WHERE job_id = %s", (job_id,)) as rows:
+            for row in rows:
+                ...
+
+    Holds one pooled connection (inside a read transaction) until the block
+    exits. Rows are dicts like execute_query's, or plain tuples with
+    tuples=True, which is cheaper per row; RowStream.columns has the names.
+    A stale connection is retried before the first row is handed out."""
+    itersize = itersize or STREAM_ITERSIZE
+    try:
+        conn, cursor, first_batch = _open_stream(query, params, itersize, tuples)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        conn, cursor, first_batch = _open_stream(query, params, itersize, tuples)
+    stale = False
+    try:
+        yield RowStream(cursor, first_batch)
+        cursor.close()
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        stale = True
+        raise
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _release(conn, discard=stale)
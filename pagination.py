@@ -0,0 +1,123 @@
+"""Keyset ("seek") pagination for the listing pages.
+
+A page is the next PAGE_SIZE rows after a cursor in a fixed, unique sort
+order, e.g. (created_at DESC, id DESC): the query says WHERE (created_at,
+id) < (cursor values) ... LIMIT n+1, which an index on the sort columns
+answers without reading the rows before it, so page 200 costs what page 1
+does (OFFSET would read and discard everything in front of it). The extra
+row only tells us whether there is a next page.
+
+Cursors are opaque URL-safe tokens holding the last row's sort values.
+A malformed token is treated as "first page" rather than an error.
+
+Totals come from the planner's row estimate (EXPLAIN) rather than
+COUNT(*), unless the whole result fits on the first page."""
+import base64
+import json
+import os
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+
+def page_size(value=None):
+    """PAGE_SIZE, or a requested size clamped to 1..PAGE_SIZE_MAX."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, width):
+    """The `width` sort values in `token`, or None for a missing/bad token."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != width:
+        return None
+    if not all(isinstance(v, (str, int, float)) for v in values):
+        return None
+    return values
+
+
+def order_by(keys):
+    """ORDER BY body for keys = [(sql expression, "ASC"|"DESC"), ...]."""
+    return ", ".join(f"{expr} {direction}" for expr, direction in keys)
+
+
+def after(keys, cursor):
+    """(predicate, params) matching rows that sort after `cursor` in `keys`
+    order. Uniform directions use a row comparison, which btree indexes
+    can seek on; mixed directions expand into OR-ed prefixes."""
+    if len({direction for _, direction in keys}) == 1:
+        op = ">" if keys[0][1] == "ASC" else "<"
+        exprs = ", ".join(expr for expr, _ in keys)
+        placeholders = ", ".join(["%s"] * len(keys))
+        return f"({exprs}) {op} ({placeholders})", list(cursor)
+    clauses, params = [], []
+    for i, (expr, direction) in enumerate(keys):
+        op = ">" if direction == "ASC" else "<"
+        terms = [f"{prefix} = %s" for prefix, _ in keys[:i]] + [f"{expr} {op} %s"]
+        clauses.append("(" + " AND ".join(terms) + ")")
+        params += list(cursor[:i + 1])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def page_query(inner, keys, cursor, size):
+    """(sql, params) for one page of `inner`, a query whose output has a
+    column named after each key: the rows after `cursor` (None for the first
+    page) in key order, plus one to tell whether another page follows.
+    Prepend inner's own params. Simple subqueries are flattened by the
+    planner, so the seek still reaches the index."""
+    sql, params = f"SELECT * FROM ({inner}) page", []
+    if cursor is not None:
+        seek, params = after(keys, cursor)
+        sql += " WHERE " + seek
+    return sql + f" ORDER BY {order_by(keys)} LIMIT %s", params + [size + 1]
+
+
+def split_page(rows, size, keys):
+    """Trim a page_query result to the page and build the next cursor from
+    the last row on it (None when this is the last page)."""
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor([rows[-1][name] for name, _ in keys])
+
+
+def estimate_sql(query):
+    """EXPLAIN wrapper for a count estimate; read it with estimated_rows()."""
+    return "EXPLAIN (FORMAT JSON) " + query
+
+
+def estimated_rows(explain_row):
+    return int(explain_row["QUERY PLAN"][0]["Plan"]["Plan Rows"])
+
+
+def total(explain_row, rows, first_page, next_cursor):
+    """(count, exact) for a listing: exact when the first page holds every
+    row, otherwise the planner's estimate (never fewer than we know of)."""
+    if first_page and next_cursor is None:
+        return len(rows), True
+    estimate = estimated_rows(explain_row) if explain_row else 0
+    return max(estimate, len(rows) + (1 if next_cursor else 0)), False
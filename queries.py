@@ -0,0 +1,130 @@
+"""SQL for the hot listing and lookup paths, shared by the routes in app.py
+and by check_indexes.py, which EXPLAINs exactly these statements against
+the indexes built for them. Builders return SQL plus params and don't touch
+the database."""
+from neon_client import uuid_array
+
+# Search goes through the trigram indexes from migrations/0004-0005: the
+# expressions must match the indexed ones exactly. ILIKE catches substrings
+# (names, phone fragments, emails); <% adds typo-tolerant word matches.
+JOB_SEARCH_TEXT = "job_search_text(client_name, email, phone, address, notes)"
+TEMPLATE_SEARCH_TEXT = "template_search_text(name, description)"
+
+# Jobs listed on each /clients card
+CLIENT_CARD_JOBS = 5
+
+# Piece counts, sheets and payments come from job_summaries, which triggers
+# keep current on every parts/cut_sheets/payments write
+JOB_LIST_COLUMNS = """j.id, j.client_name, j.email, j.phone, j.final_price, j.status, j.created_at,
+       COALESCE(s.pieces_3_4, 0) AS pieces_3_4, COALESCE(s.pieces_1_2, 0) AS pieces_1_2,
+       COALESCE(s.pieces_1_4, 0) AS pieces_1_4, COALESCE(s.pieces_other, 0) AS pieces_other,
+       COALESCE(s.total_pieces, 0) AS total_pieces, COALESCE(s.total_area, 0) AS total_area,
+       COALESCE(s.sheet_count, 0) AS sheet_count, COALESCE(s.total_paid, 0) AS total_paid,
+       GREATEST(j.updated_at, s.last_activity_at) AS last_activity_at"""
+
+
+def search_clause(expr):
+    """(WHERE fragment, ORDER BY fragment) for ranked trigram search on expr;
+    pass search_params(q) for the WHERE and q again for the ORDER BY."""
+    return (f"({expr} ILIKE %s OR %s <%% {expr})",
+            f"word_similarity(%s, {expr}) DESC")
+
+
+def search_rank(expr):
+    """Rank column for a keyset-paginated search; bind q. word_similarity()
+    is a float4, and its value comes back from the cursor as a float8
+    literal that never equals the widened float4, so tied ranks would repeat
+    or be skipped across pages. As float8 it round-trips exactly."""
+    return f"word_similarity(%s, {expr})::float8"
+
+
+def like_escape(q):
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_params(q):
+    return [f"%{like_escape(q)}%", q]
+
+
+def job_list(user_id, q=None, status=None, client_id=None):
+    """The /jobs listing as (inner SQL, its params, keyset keys) for
+    pagination.page_query, plus (SQL, params) of the same filter for
+    pagination.estimate_sql. A search ranks best matches first; the rank is
+    a column so the cursor can carry it."""
+    where, params = "j.user_id = %s", [user_id]
+    if q:
+        where += " AND " + search_clause(JOB_SEARCH_TEXT)[0]
+        params += search_params(q)
+    if status:
+        where += " AND j.status = %s"
+        params.append(status)
+    if client_id:
+        where += " AND j.client_id = %s"
+        params.append(client_id)
+    columns, inner_params = JOB_LIST_COLUMNS, list(params)
+    if q:
+        columns += f", {search_rank(JOB_SEARCH_TEXT)} AS rank"
+        inner_params.insert(0, q)
+        keys = [("rank", "DESC"), ("created_at", "DESC"), ("id", "DESC")]
+    else:
+        keys = [("created_at", "DESC"), ("id", "DESC")]
+    inner = f"SELECT {columns} FROM jobs j LEFT JOIN job_summaries s ON s.job_id = j.id WHERE {where}"
+    return (inner, inner_params, keys), (f"SELECT 1 FROM jobs j WHERE {where}", params)
+
+
+def client_list(user_id):
+    """The /clients listing, in the same shape as job_list(). Job counts and
+    revenue come from each client's jobs (idx_jobs_client_created), computed
+    only for the clients on the page."""
+    inner = """
+        SELECT c.id, c.name, c.name_key, c.email, c.phone,
+               s.job_count, s.revenue
+        FROM clients c
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS job_count, COALESCE(SUM(final_price), 0) AS revenue
+            FROM jobs WHERE client_id = c.id
+        ) s
+        WHERE c.user_id = %s
+    """
+    return (inner, [user_id], [("name_key", "ASC")]), ("SELECT 1 FROM clients WHERE user_id = %s", [user_id])
+
+
+def client_jobs(client_ids, per_client=CLIENT_CARD_JOBS):
+    """(SQL, params) for the newest `per_client` jobs of each client on a
+    /clients page, newest first within each client; one bounded
+    idx_jobs_client_created scan per client, so a busy client's history
+    isn't pulled in full. The rest are on /jobs?client_id=."""
+    return ("""
+        SELECT j.id, j.client_id, j.status, j.final_price, j.created_at
+        FROM unnest(%s::uuid[]) AS c(id)
+        CROSS JOIN LATERAL (
+            SELECT id, client_id, status, final_price, created_at
+            FROM jobs WHERE client_id = c.id
+            ORDER BY created_at DESC LIMIT %s
+        ) j
+        ORDER BY j.client_id, j.created_at DESC
+    """, (uuid_array(client_ids), per_client))
+
+
+def material_stock(user_id, job_id):
+    """execute_reads entry comparing the job's persisted cut plan with the
+    user's Stock Inventory: sheets per thickness in cut_sheets (the layout's
+    label_prefix, e.g. 3/4") joined to stocks.thickness (migrations/0011),
+    in plan order; app._material_check() reads it. The IS NOT NULL repeats
+    the predicate of the partial idx_stocks_user_thickness so the planner
+    can always use it."""
+    return ("""
+        WITH plan AS (
+            SELECT rtrim(layout->>'label_prefix', '"') AS thickness,
+                   COUNT(*) AS needed, MIN(sheet_number) AS first_sheet
+            FROM cut_sheets
+            WHERE job_id = %s AND layout->>'label_prefix' IS NOT NULL
+            GROUP BY 1
+        )
+        SELECT plan.thickness, plan.needed,
+               COALESCE(SUM(s.quantity), 0) AS on_hand, COUNT(s.id) AS matches
+        FROM plan LEFT JOIN stocks s
+          ON s.user_id = %s AND s.thickness IS NOT NULL AND s.thickness = plan.thickness
+        GROUP BY plan.thickness, plan.needed, plan.first_sheet
+        ORDER BY plan.first_sheet
+    """, (job_id, user_id))
@@ -0,0 +1,327 @@
+"""Read-through cache for hot, opted-in queries (a job's row, its parts, its
+cut sheets) that several pages fetch within seconds of each other.
+
+Entries are tagged — job_tag(job_id), user_tag(user_id) — and every write
+that touches tagged data goes through execute_write() or calls invalidate(),
+which bumps the tags' versions. An entry remembers the versions it was read
+under and is a miss once any of them moves on, so a read that races a write
+can never store stale rows. Entries also expire after QUERY_CACHE_TTL
+seconds, and the store is LRU-bounded to QUERY_CACHE_MAX entries.
+
+Backends (QUERY_CACHE):
+  memory  per-process dict; fine with a single gunicorn worker
+  sqlite  a SQLite file (QUERY_CACHE_PATH) shared by every worker on the
+          host, so an invalidation in one is seen by all
+  off     pass straight through to neon_client
+The default is memory, or sqlite when WEB_CONCURRENCY asks for several
+workers."""
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from neon_client import execute_query, execute_single, execute_reads
+
+TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))
+MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX", "2000"))
+PATH = os.getenv("QUERY_CACHE_PATH", "/tmp/cutbyzewo-query-cache.sqlite3")
+BACKEND = os.getenv(
+    "QUERY_CACHE",
+    "sqlite" if int(os.getenv("WEB_CONCURRENCY", "1") or 1) > 1 else "memory",
+)
+
+
+def job_tag(job_id):
+    return f"job:{job_id}"
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+class MemoryBackend:
+    """LRU dict of pickled results plus tag versions, for one process."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires, tags, versions, payload)
+        self._versions = {}            # tag -> (version, bumped_at)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(t, (0, 0))[0] for t in tags]
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, tags, versions, payload = entry
+            if expires < now or versions != [self._versions.get(t, (0, 0))[0] for t in tags]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, tags, versions, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, list(tags), list(versions), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump(self, tags):
+        now = time.time()
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = (next(self._counter), now)
+            # A version only has to outlive the entries read before it was
+            # bumped, i.e. one TTL; versions never repeat, so dropping older
+            # ones can't revive anything.
+            if len(self._versions) > self.max_entries:
+                cutoff = now - TTL
+                for tag in [t for t, (_, at) in self._versions.items() if at < cutoff]:
+                    del self._versions[tag]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """Same contract as MemoryBackend, stored in a SQLite file in WAL mode so
+    every worker process on the host shares entries and tag versions."""
+
+    name = "sqlite"
+
+    def __init__(self, path=PATH, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _db(self):
+        # One connection per thread and per process (never reuse across fork)
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, payload BLOB, tags TEXT, versions TEXT,
+                expires REAL, used REAL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+            db.execute("CREATE TABLE IF NOT EXISTS tag_versions (tag TEXT PRIMARY KEY, version INTEGER, bumped REAL)")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _current(self, db, tags):
+        if not tags:
+            return []
+        rows = dict(db.execute(
+            f"SELECT tag, version FROM tag_versions WHERE tag IN ({','.join('?' * len(tags))})", list(tags)
+        ).fetchall())
+        return [rows.get(t, 0) for t in tags]
+
+    def versions(self, tags):
+        return self._current(self._db(), tags)
+
+    def get(self, key):
+        db = self._db()
+        row = db.execute("SELECT payload, tags, versions, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        payload, tags, versions, expires = row
+        now = time.time()
+        if expires < now or json.loads(versions) != self._current(db, json.loads(tags)):
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        return payload
+
+    def set(self, key, payload, tags, versions, ttl):
+        db = self._db()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (key, payload, json.dumps(list(tags)), json.dumps(list(versions)), now + ttl, now),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            db.execute("DELETE FROM entries WHERE expires < ?", (now,))
+            db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            db.execute("DELETE FROM tag_versions WHERE bumped < ?", (now - TTL,))
+
+    def bump(self, tags):
+        db = self._db()
+        now = time.time()
+        for tag in tags:
+            # Nanosecond timestamps never repeat, so pruning old tag rows
+            # can't make an old version match again
+            db.execute(
+                "INSERT OR REPLACE INTO tag_versions VALUES (?, ?, ?)",
+                (tag, time.time_ns(), now),
+            )
+
+    def clear(self):
+        self._db().execute("DELETE FROM entries")
+
+
+def _make_backend(name):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    return None
+
+
+_backend = _make_backend(BACKEND)
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+
+def configure(backend):
+    """Switch backend ("memory", "sqlite", "off", or a backend instance)."""
+    global _backend
+    _backend = backend if not isinstance(backend, str) else _make_backend(backend)
+
+
+def stats():
+    """Hit/miss counters for this process, plus the hit rate."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return dict(_stats, backend=_backend.name if _backend is not None else "off",
+                hit_rate=round(_stats["hits"] / lookups, 3) if lookups else None)
+
+
+def _key(kind, query, params):
+    raw = json.dumps([kind, query, params], default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _lookup(key):
+    try:
+        payload = _backend.get(key)
+    except Exception as e:  # a cache fault must never fail the page
+        _stats["errors"] += 1
+        print("Query cache read failed:", e)
+        return None
+    if payload is None:
+        return None
+    return pickle.loads(payload)
+
+
+def _store(key, value, tags, versions, ttl):
+    # Per-query ttl can only shorten QUERY_CACHE_TTL: tag versions are
+    # pruned one TTL after a bump, and no entry may outlive that.
+    ttl = min(ttl or TTL, TTL)
+    try:
+        _backend.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), tags, versions, ttl)
+    except Exception as e:
+        _stats["errors"] += 1
+        print("Query cache write failed:", e)
+
+
+def _versions(tags):
+    try:
+        return _backend.versions(tags)
+    except Exception as e:
+        _stats["errors"] += 1
+        print("Query cache read failed:", e)
+        return None
+
+
+def _read_through(kind, query, params, tags, ttl, fetch):
+    if _backend is None:
+        return fetch()
+    key = _key(kind, query, params)
+    hit = _lookup(key)
+    if hit is not None:
+        _stats["hits"] += 1
+        return hit[0]
+    _stats["misses"] += 1
+    # Versions are read before the query, so a write landing in between
+    # leaves this entry already out of date rather than silently stale.
+    versions = _versions(tags)
+    value = fetch()
+    if versions is not None:
+        _store(key, (value,), tags, versions, ttl)
+    return value
+
+
+def cached_query(query, params=None, tags=(), ttl=None):
+    """execute_query(query, params, fetch=True), served from the cache when
+    an entry for the same SQL and params is still valid."""
+    return _read_through("all", query, params, tags, ttl,
+                         lambda: execute_query(query, params, fetch=True))
+
+
+def cached_single(query, params=None, tags=(), ttl=None):
+    """execute_single(query, params) through the cache. A missing row (None)
+    is cached too."""
+    return _read_through("one", query, params, tags, ttl,
+                         lambda: execute_single(query, params))
+
+
+def cached_reads(queries, tags=(), cached=(), ttl=None):
+    """execute_reads(queries), with the names listed in `cached` served from
+    and stored to the cache under `tags`. Everything that misses still runs
+    as one execute_reads batch."""
+    if _backend is None or not cached:
+        return execute_reads(queries)
+    results, keys, pending = {}, {}, {}
+    for name, spec in queries.items():
+        if name in cached:
+            keys[name] = _key("one" if len(spec) > 2 and spec[2] == "one" else "all", spec[0], spec[1])
+            hit = _lookup(keys[name])
+            if hit is not None:
+                _stats["hits"] += 1
+                results[name] = hit[0]
+                continue
+            _stats["misses"] += 1
+        pending[name] = spec
+    if pending:
+        versions = _versions(tags) if any(name in keys for name in pending) else None
+        fetched = execute_reads(pending)
+        results.update(fetched)
+        if versions is not None:
+            for name in pending:
+                if name in keys:
+                    _store(keys[name], (fetched[name],), tags, versions, ttl)
+    return results
+
+
+def invalidate(*tags):
+    """Mark every entry carrying any of `tags` stale. Call after the write
+    has committed."""
+    if _backend is None or not tags:
+        return
+    _stats["invalidations"] += 1
+    try:
+        _backend.bump(tags)
+    except Exception as e:
+        # Can't guarantee coherence any more: drop what this backend holds
+        _stats["errors"] += 1
+        print("Query cache invalidation failed:", e)
+        try:
+            _backend.clear()
+        except Exception:
+            pass
+
+
+def execute_write(query, params=None, tags=()):
+    """execute_query for a write, then invalidate `tags`."""
+    result = execute_query(query, params, fetch=False)
+    invalidate(*tags)
+    return result
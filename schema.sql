@@ -1,5 +1,5 @@
--- Complete database schema for Neon migration from Supabase
--- This recreates all tables and relationships
+-- Reference copy of the full schema. Databases are created and upgraded by
+-- `python migrate.py` from migrations/; keep this file in step with them.
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -10,18 +10,38 @@ CREATE TABLE users (
     email VARCHAR(255) UNIQUE NOT NULL,
     username VARCHAR(255),
     password_hash VARCHAR(255) NOT NULL,
+    reset_token_hash VARCHAR(64),
+    reset_token_expires TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Clients table (one per user and name, ignoring case and outer spaces)
+CREATE TABLE clients (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    name_key VARCHAR(255) GENERATED ALWAYS AS (lower(trim(name))) STORED,
+    email VARCHAR(255),
+    phone VARCHAR(50),
+    address TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Jobs table
 CREATE TABLE jobs (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    client_id UUID REFERENCES clients(id) ON DELETE SET NULL,
     client_name VARCHAR(255),
     final_price DECIMAL(10,2),
     status VARCHAR(50) DEFAULT 'draft',
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    phone VARCHAR(50),
+    email VARCHAR(255),
+    address TEXT,
+    notes TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -33,6 +53,7 @@ CREATE TABLE parts (
     height DECIMAL(10,2) NOT NULL,
     thickness VARCHAR(50),
     material VARCHAR(100),
+    quantity INTEGER NOT NULL DEFAULT 1 CONSTRAINT parts_quantity_positive CHECK (quantity > 0),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -59,6 +80,8 @@ CREATE TABLE estimates (
     contract_terms TEXT,
     contract_extra_rules TEXT,
     contract_language VARCHAR(5) DEFAULT 'en',
+    share_token VARCHAR(64),
+    estimate_type VARCHAR(20) DEFAULT 'quote',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -97,6 +120,10 @@ CREATE TABLE IF NOT EXISTS cut_sheets (
     src VARCHAR(500) NOT NULL,
     label VARCHAR(100),
     sheet_number INTEGER,
+    plan_hash VARCHAR(64),
+    layout JSONB,
+    thumb_src VARCHAR(500),
+    medium_src VARCHAR(500),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -110,32 +137,154 @@ CREATE TABLE stocks (
     unit VARCHAR(50),
     code VARCHAR(100),
     color VARCHAR(50),
+    thickness VARCHAR(50),
+    material VARCHAR(100),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Create indexes for better performance
-CREATE INDEX idx_jobs_user_id ON jobs(user_id);
+-- Saved job templates
+CREATE TABLE job_templates (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    parts JSONB DEFAULT '[]',
+    accessories JSONB DEFAULT '[]',
+    source_job_id UUID REFERENCES jobs(id) ON DELETE SET NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Accessories (hardware etc.) attached to a job
+CREATE TABLE job_accessories (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    quantity DECIMAL(10,2) DEFAULT 1,
+    unit VARCHAR(50) DEFAULT 'pieces',
+    unit_price DECIMAL(10,2) DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Hours logged against a job
+CREATE TABLE job_hours (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    hours NUMERIC(6,2) NOT NULL,
+    work_date DATE,
+    notes TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Payments received for a job
+CREATE TABLE payments (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_id UUID NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    amount DECIMAL(10,2) NOT NULL,
+    payment_type VARCHAR(50) DEFAULT 'deposit',
+    notes TEXT,
+    paid_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Per-job rollup for the /jobs list, maintained by triggers on parts,
+-- cut_sheets and payments (see migrations/0007_job_summaries.sql for the
+-- refresh_job_summary() function and triggers)
+CREATE TABLE job_summaries (
+    job_id UUID PRIMARY KEY REFERENCES jobs(id) ON DELETE CASCADE,
+    pieces_3_4 INTEGER NOT NULL DEFAULT 0,
+    pieces_1_2 INTEGER NOT NULL DEFAULT 0,
+    pieces_1_4 INTEGER NOT NULL DEFAULT 0,
+    pieces_other INTEGER NOT NULL DEFAULT 0,
+    total_pieces INTEGER NOT NULL DEFAULT 0,
+    total_area NUMERIC(14,2) NOT NULL DEFAULT 0,
+    sheet_count INTEGER NOT NULL DEFAULT 0,
+    total_paid DECIMAL(10,2) NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Applied migrations (managed by migrate.py)
+CREATE TABLE schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create indexes for better performance (migrations/0003, 0008-0012)
+CREATE INDEX idx_jobs_user_created_id ON jobs(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_jobs_user_status_created_id ON jobs(user_id, status, created_at DESC, id DESC);
+CREATE INDEX idx_jobs_client_created ON jobs(client_id, created_at DESC);
 CREATE INDEX idx_jobs_created_at ON jobs(created_at);
-CREATE INDEX idx_jobs_status ON jobs(status);
 
-CREATE INDEX idx_parts_job_id ON parts(job_id);
+CREATE UNIQUE INDEX idx_clients_user_name_key ON clients(user_id, name_key);
+CREATE INDEX idx_clients_user_name_key_prefix ON clients(user_id, name_key text_pattern_ops);
+
+CREATE INDEX idx_parts_job_created ON parts(job_id, created_at);
 CREATE INDEX idx_parts_material ON parts(material);
 
 CREATE INDEX idx_deadlines_job_id ON deadlines(job_id);
 CREATE INDEX idx_deadlines_user_id ON deadlines(user_id);
 CREATE INDEX idx_deadlines_hard_deadline ON deadlines(hard_deadline);
+CREATE INDEX idx_deadlines_user_hard_deadline ON deadlines(user_id, hard_deadline) WHERE hard_deadline IS NOT NULL;
 
-CREATE INDEX idx_estimates_job_id ON estimates(job_id);
+CREATE INDEX idx_users_reset_token_hash ON users(reset_token_hash) WHERE reset_token_hash IS NOT NULL;
+
+CREATE INDEX idx_estimates_job_created ON estimates(job_id, created_at DESC);
 CREATE INDEX idx_estimates_created_at ON estimates(created_at);
+CREATE UNIQUE INDEX idx_estimates_share_token ON estimates(share_token) WHERE share_token IS NOT NULL;
 
-CREATE INDEX idx_estimate_items_estimate_id ON estimate_items(estimate_id);
+CREATE INDEX idx_estimate_items_estimate_type_created ON estimate_items(estimate_id, item_type, created_at);
 
-CREATE INDEX idx_files_job_id ON files(job_id);
+CREATE INDEX idx_files_job_uploaded ON files(job_id, uploaded_at);
 CREATE INDEX idx_files_user_id ON files(user_id);
 
-CREATE INDEX idx_stocks_user_id ON stocks(user_id);
+CREATE INDEX idx_cut_sheets_job_sheet ON cut_sheets(job_id, sheet_number);
+CREATE INDEX idx_payments_job_paid ON payments(job_id, paid_at DESC);
+CREATE INDEX idx_job_hours_job_work_date ON job_hours(job_id, work_date DESC NULLS LAST, created_at DESC);
+CREATE INDEX idx_job_accessories_job_created ON job_accessories(job_id, created_at);
+
+CREATE INDEX idx_stocks_user_category_name_id ON stocks(user_id, (COALESCE(category, '')), name, id);
 CREATE INDEX idx_stocks_category ON stocks(category);
+CREATE INDEX idx_stocks_user_thickness ON stocks(user_id, thickness) INCLUDE (quantity) WHERE thickness IS NOT NULL;
+
+CREATE INDEX idx_job_templates_name_id ON job_templates(name, id);
+
+-- Stock thickness/material parsing (migrations/0011)
+CREATE OR REPLACE FUNCTION stock_material(name TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE
+        WHEN name ~* 'melamine' THEN 'Melamine'
+        WHEN name ~* '\mmdf\M' THEN 'MDF'
+        WHEN name ~* 'particle' THEN 'Particleboard'
+        WHEN name ~* 'plywood|\mply\M' THEN 'Plywood'
+        WHEN name ~* 'panel|board|sheet' THEN 'Panel'
+    END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION stock_thickness(name TEXT, unit TEXT)
+RETURNS TEXT AS $$
+    SELECT CASE WHEN stock_material(name) IS NOT NULL OR unit ~* '^\s*sheet'
+                THEN substring(name from '(\d+/\d+)') END
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Trigram search (migrations/0004-0005)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION job_search_text(client_name TEXT, email TEXT, phone TEXT, address TEXT, notes TEXT)
+RETURNS TEXT AS $$
+    SELECT coalesce(client_name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(phone, '')
+        || ' ' || coalesce(address, '') || ' ' || coalesce(notes, '')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION template_search_text(name TEXT, description TEXT)
+RETURNS TEXT AS $$
+    SELECT coalesce(name, '') || ' ' || coalesce(description, '')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX idx_jobs_search_trgm ON jobs USING GIN (job_search_text(client_name, email, phone, address, notes) gin_trgm_ops);
+CREATE INDEX idx_job_templates_search_trgm ON job_templates USING GIN (template_search_text(name, description) gin_trgm_ops);
 
 -- Update triggers for updated_at timestamps
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -152,5 +301,8 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
 CREATE TRIGGER update_jobs_updated_at BEFORE UPDATE ON jobs
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_clients_updated_at BEFORE UPDATE ON clients
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 CREATE TRIGGER update_stocks_updated_at BEFORE UPDATE ON stocks
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
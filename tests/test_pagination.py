@@ -0,0 +1,87 @@
+"""Keyset pagination over search results whose ranks tie.
+
+Postgres isn't needed: rows are ranked the way `search_rank()` makes the
+database return them (a float4 word_similarity widened to float8), the
+cursor goes through the same encode/decode as a "Load more" URL, and the
+seek is evaluated with the comparison `pagination.after()` asks for."""
+import functools
+import os
+import struct
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pagination
+import queries
+
+
+def _float4(value):
+    """value as stored in a Postgres real, then widened to float8 (::float8)."""
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def _sorts_after(row, keys, cursor):
+    # What the WHERE from pagination.after() selects: the first key that
+    # differs decides, in that key's direction
+    for (name, direction), value in zip(keys, cursor):
+        mine = pagination._plain(row[name])
+        if mine != value:
+            return mine > value if direction == "ASC" else mine < value
+    return False
+
+
+def _page_through(rows, keys, size):
+    def compare(a, b):
+        values = [pagination._plain(b[name]) for name, _ in keys]
+        return 1 if _sorts_after(a, keys, values) else -1 if a is not b else 0
+
+    ordered = sorted(rows, key=functools.cmp_to_key(compare))
+    seen, token = [], None
+    for _ in range(len(rows) + 1):
+        cursor = pagination.decode_cursor(token, len(keys))
+        candidates = [r for r in ordered if cursor is None or _sorts_after(r, keys, cursor)]
+        page, token = pagination.split_page(candidates[:size + 1], size, keys)
+        seen.extend(r["id"] for r in page)
+        if token is None:
+            return seen
+    raise AssertionError("pagination did not terminate")
+
+
+def _ranked_rows():
+    start = datetime(2026, 1, 1)
+    ranks = [4 / 7, 4 / 7, 4 / 7, 1 / 3, 1 / 3, 1 / 3, 1 / 3, 0.9, 0.25]
+    return [
+        {"id": f"row-{i}", "name": f"Item {i % 3}", "rank": _float4(r),
+         "created_at": start - timedelta(hours=i % 2)}
+        for i, r in enumerate(ranks)
+    ]
+
+
+def test_rank_is_selected_as_float8():
+    (inner, _, keys), _ = queries.job_list("user", q="oak")
+    assert "word_similarity(%s, " + queries.JOB_SEARCH_TEXT + ")::float8 AS rank" in inner
+    assert keys[0] == ("rank", "DESC")
+
+
+def test_rank_survives_the_cursor():
+    for rank in (_float4(4 / 7), _float4(1 / 3), _float4(0.1)):
+        token = pagination.encode_cursor([rank, "x"])
+        assert pagination.decode_cursor(token, 2)[0] == rank
+
+
+def test_tied_ranks_page_once_each_with_uniform_keys():
+    rows = _ranked_rows()
+    keys = [("rank", "DESC"), ("created_at", "DESC"), ("id", "DESC")]
+    seen = _page_through(rows, keys, size=2)
+    assert sorted(seen) == sorted(r["id"] for r in rows)
+    assert len(seen) == len(set(seen))
+
+
+def test_tied_ranks_page_once_each_with_mixed_keys():
+    # The catalog's order: rank DESC, then name and id ASC
+    rows = _ranked_rows()
+    keys = [("rank", "DESC"), ("name", "ASC"), ("id", "ASC")]
+    seen = _page_through(rows, keys, size=2)
+    assert sorted(seen) == sorted(r["id"] for r in rows)
+    assert len(seen) == len(set(seen))
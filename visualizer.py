@@ -4,72 +4,197 @@ import matplotlib
 matplotlib.use('Agg')  # ✅ Safe for headless rendering (server)
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from PIL import Image
+import hashlib
+import json
 import os
+from io import BytesIO
 
-def draw_sheets_to_files(sheets, output_dir, start_index=1, label_prefix=None):
-    os.makedirs(output_dir, exist_ok=True)
+# Bump whenever the drawing code changes what a sheet looks like. Sheet
+# images are served as immutable, so the hash has to change with the pixels.
+# cut_sheets.plan_hash keeps the hash from when the sheet was planned; the app
+# recomputes layout_hash() from the stored layout for URLs and lookups, so a
+# bump reaches existing sheets too.
+RENDER_VERSION = 2
 
-    results = []
+# Sheets are a handful of flat fills plus anti-aliased text, so a small
+# palette is visually lossless and ~3-4x smaller than matplotlib's RGBA.
+PNG_PALETTE_COLORS = 64
+
+SHEET_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Downscaled PNG variants (max width in px) for cards and galleries; the
+# full-size render is only fetched when someone clicks through.
+SHEET_VARIANTS = {"thumb": 240, "medium": 480}
+
+def sheet_layout(sheet, sheet_idx, label_prefix=None):
+    """JSON-safe snapshot of everything needed to redraw one sheet later."""
+    panel_w, panel_h = sheet['panel_size']
+    return {
+        "sheet_number": sheet_idx,
+        "label_prefix": label_prefix,
+        "panel_size": [panel_w, panel_h],
+        "cut_plan": [
+            {
+                "part_number": cut['part_number'],
+                "width": cut['width'],
+                "height": cut['height'],
+                "position": list(cut['position']),
+            }
+            for cut in sheet['cut_plan']
+        ],
+    }
+
+def layout_hash(layout):
+    """Content hash of a sheet layout — doubles as the image file name and
+    its ETag, so identical layouts always map to the same bytes."""
+    payload = json.dumps([RENDER_VERSION, layout], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def sheet_label(layout):
+    panel_w, panel_h = layout['panel_size']
+    label = f"{int(panel_w)} x {int(panel_h)}"
+    if layout.get('label_prefix'):
+        label = f"{layout['label_prefix']} — {label}"
+    return label
+
+def encode_png(raw_png):
+    """Re-encode matplotlib's RGBA PNG as an 8-bit paletted PNG with maximum
+    zlib effort. No text chunks are carried over, so the Software/metadata
+    tags matplotlib writes are dropped too."""
+    with Image.open(BytesIO(raw_png)) as img:
+        paletted = img.convert("RGB").quantize(colors=PNG_PALETTE_COLORS, dither=Image.Dither.NONE)
+    out = BytesIO()
+    paletted.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+def _write_atomic(file_path, data):
+    # Write to a temp name and rename, so a concurrent request for the same
+    # sheet never serves a half-written file.
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+
+def draw_layout(layout, file_path, fmt="png"):
+    """Render one persisted sheet layout to `file_path` as PNG or SVG.
+    Returns the number of bytes the PNG encoding stage saved."""
+    fig, ax = plt.subplots(figsize=(10, 5))
+    panel_w, panel_h = layout['panel_size']
+
+    ax.add_patch(
+        patches.Rectangle(
+            (0, 0), panel_w, panel_h,
+            edgecolor='black',
+            facecolor='lightgray',
+            fill=True
+        )
+    )
+
+    for cut in layout['cut_plan']:
+        x, y = cut['position']
+        w, h = cut['width'], cut['height']
+        rect = patches.Rectangle(
+            (x, y), w, h,
+            edgecolor='blue',
+            facecolor='skyblue',
+            alpha=0.7
+        )
+        ax.add_patch(rect)
+        ax.text(
+            x + w/2, y + h/2,
+            f"#{cut['part_number']}",
+            ha='center',
+            va='center',
+            fontsize=8
+        )
+
+    ax.set_xlim(0, panel_w)
+    ax.set_ylim(0, panel_h)
+    ax.set_aspect('equal')
+
+    ax.set_xticks(range(0, int(panel_w)+1, 12))
+    ax.set_yticks(range(0, int(panel_h)+1, 12))
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
+
+    title = f"Sheet #{layout['sheet_number']}"
+    if layout.get('label_prefix'):
+        title += f" — {layout['label_prefix']}"
+    title += f" — {panel_w} x {panel_h} inches"
+    ax.set_title(title)
+    ax.invert_yaxis()
+
+    buf = BytesIO()
+    plt.savefig(buf, bbox_inches='tight', format=fmt)
+    plt.close(fig)
+    data = buf.getvalue()
+
+    saved = 0
+    if fmt == "png":
+        encoded = encode_png(data)
+        saved = len(data) - len(encoded)
+        data = encoded
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    _write_atomic(file_path, data)
+    return saved
+
+def variant_name(digest, variant=None):
+    """File stem for a sheet image: `<hash>` for full size, `<hash>-<variant>`
+    for the downscaled copies."""
+    return f"{digest}-{variant}" if variant else digest
 
+def derive_variant(full_path, variant_path, variant):
+    """Downscale a full-size sheet PNG into one of SHEET_VARIANTS. Resampling
+    smears the flat fills into thousands of shades, so the result is folded
+    back onto a small palette — otherwise it can outweigh the original."""
+    max_w = SHEET_VARIANTS[variant]
+    with Image.open(full_path) as img:
+        img = img.convert("RGB")
+        if img.width > max_w:
+            img = img.resize((max_w, round(img.height * max_w / img.width)), Image.LANCZOS)
+        out = BytesIO()
+        img.quantize(colors=32).save(out, format="PNG", optimize=True)
+    _write_atomic(variant_path, out.getvalue())
+    return variant_path
+
+def sheet_records(sheets, output_dir, start_index=1, label_prefix=None):
+    """Layout, content hash and would-be file paths for each non-empty sheet,
+    without drawing anything: enough to persist a cut plan and let the image
+    route render each sheet the first time it's requested."""
+    results = []
     for offset, sheet in enumerate(sheets):
         if not sheet['cut_plan']:
             continue
-        sheet_idx = start_index + offset
-
-        fig, ax = plt.subplots(figsize=(10, 5))
-        panel_w, panel_h = sheet['panel_size']
-
-        ax.add_patch(
-            patches.Rectangle(
-                (0, 0), panel_w, panel_h,
-                edgecolor='black',
-                facecolor='lightgray',
-                fill=True
-            )
-        )
-
-        for cut in sheet['cut_plan']:
-            x, y = cut['position']
-            w, h = cut['width'], cut['height']
-            rect = patches.Rectangle(
-                (x, y), w, h,
-                edgecolor='blue',
-                facecolor='skyblue',
-                alpha=0.7
-            )
-            ax.add_patch(rect)
-            ax.text(
-                x + w/2, y + h/2,
-                f"#{cut['part_number']}",
-                ha='center',
-                va='center',
-                fontsize=8
-            )
-
-        ax.set_xlim(0, panel_w)
-        ax.set_ylim(0, panel_h)
-        ax.set_aspect('equal')
-
-        ax.set_xticks(range(0, int(panel_w)+1, 12))
-        ax.set_yticks(range(0, int(panel_h)+1, 12))
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
-
-        title = f"Sheet #{sheet_idx}"
-        if label_prefix:
-            title += f" — {label_prefix}"
-        title += f" — {panel_w} x {panel_h} inches"
-        ax.set_title(title)
-        ax.invert_yaxis()
-
-        file_path = os.path.join(output_dir, f"sheet_{sheet_idx}.png")
-        plt.savefig(file_path, bbox_inches='tight')
-        plt.close(fig)
-
-        # Return path relative to static/ and a label for the template
-        relative_path = file_path.replace("static/", "", 1)
-        label = f"{int(panel_w)} x {int(panel_h)}"
-        if label_prefix:
-            label = f"{label_prefix} — {label}"
-        results.append((relative_path, label))
+        layout = sheet_layout(sheet, start_index + offset, label_prefix)
+        digest = layout_hash(layout)
+        file_path = os.path.join(output_dir, f"{digest}.png")
+        # Paths are relative to static/
+        result = {
+            "src": file_path.replace("static/", "", 1),
+            "label": sheet_label(layout),
+            "plan_hash": digest,
+            "layout": layout,
+        }
+        for variant in SHEET_VARIANTS:
+            variant_path = os.path.join(output_dir, f"{variant_name(digest, variant)}.png")
+            result[f"{variant}_src"] = variant_path.replace("static/", "", 1)
+        results.append(result)
+    return results
 
+def draw_sheets_to_files(sheets, output_dir, start_index=1, label_prefix=None):
+    """sheet_records(), with every image and variant rendered up front (for
+    scripts; the app renders lazily)."""
+    os.makedirs(output_dir, exist_ok=True)
+    results = sheet_records(sheets, output_dir, start_index, label_prefix)
+    for result in results:
+        digest = result["plan_hash"]
+        file_path = os.path.join(output_dir, f"{digest}.png")
+        result["bytes_saved"] = 0
+        if not os.path.exists(file_path):
+            result["bytes_saved"] = draw_layout(result["layout"], file_path)
+        for variant in SHEET_VARIANTS:
+            variant_path = os.path.join(output_dir, f"{variant_name(digest, variant)}.png")
+            if not os.path.exists(variant_path):
+                derive_variant(file_path, variant_path, variant)
     return results